@@ -0,0 +1,155 @@
+"""
+Load test an endpoint served by sync (WSGI) and async (ASGI) gunicorn workers against a stub Braintree server and
+compare requests/sec and tail latency.
+"""
+
+from benchmarks.common import benchmark_user, parse_args
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from rest_framework_simplejwt.tokens import AccessToken
+from django.conf import settings
+import subprocess
+import statistics
+import threading
+import argparse
+import asyncio
+import socket
+import httpx
+import time
+import sys
+import os
+
+SERVERS = {
+    "sync": ["vehicles_rental.wsgi:application"],
+    "async": ["--worker-class", "uvicorn_worker.UvicornWorker", "vehicles_rental.asgi:application"],
+}
+
+
+class StubBraintreeHandler(BaseHTTPRequestHandler):
+    """Answers every Braintree API call with a client token after a fixed delay."""
+
+    protocol_version = "HTTP/1.1"
+    latency = 0.1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        time.sleep(self.latency)
+
+        body = b'<?xml version="1.0" encoding="UTF-8"?><client-token><value>stub-token</value></client-token>'
+        self.send_response(201)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(("127.0.0.1", 0))
+        return probe.getsockname()[1]
+
+
+def start_server(mode, port, gateway_port, workers):
+    env = {
+        **os.environ,
+        # The servers must accept the access token minted here
+        "DJANGO_SECRET_KEY": settings.SECRET_KEY,
+        "BRAINTREE_ENVIRONMENT": "Development",
+        "GATEWAY_PORT": str(gateway_port),
+        "BRAINTREE_MERCHANT_ID": "benchmark",
+        "BRAINTREE_PUBLIC_KEY": "benchmark",
+        "BRAINTREE_PRIVATE_KEY": "benchmark",
+        "BRAINTREE_CLIENT_TOKEN_POOL_SIZE": "0",
+    }
+    command = [sys.executable, "-m", "gunicorn", "--bind", f"127.0.0.1:{port}", "--workers", str(workers)]
+    server = subprocess.Popen(command + SERVERS[mode], cwd=settings.BASE_DIR, env=env, stderr=subprocess.DEVNULL)
+
+    deadline = time.monotonic() + 30
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise SystemExit(f"The {mode} server exited with status {server.returncode}.")
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=1).close()
+            return server
+        except OSError:
+            time.sleep(0.2)
+
+    server.terminate()
+    raise SystemExit(f"The {mode} server did not start within 30 seconds.")
+
+
+async def load(url, headers, total, concurrency):
+    timings = []
+    errors = 0
+    pending = iter(range(total))
+
+    async def client(session):
+        nonlocal errors
+        for _ in pending:
+            started = time.perf_counter()
+            try:
+                response = await session.get(url, headers=headers)
+                if response.status_code != 200:
+                    errors += 1
+                    continue
+            except httpx.HTTPError:
+                errors += 1
+                continue
+            timings.append((time.perf_counter() - started) * 1000)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(limits=limits, timeout=60) as session:
+        started = time.perf_counter()
+        await asyncio.gather(*(client(session) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return timings, errors, elapsed
+
+
+def report(mode, timings, errors, elapsed):
+    if len(timings) < 2:
+        print(f"{mode}: {len(timings)} successful requests, {errors} errors.")
+        return
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    print(
+        f"{mode}: {len(timings) / elapsed:.1f} req/s, p50={percentiles[49]:.1f}ms "
+        f"p99={percentiles[98]:.1f}ms max={max(timings):.1f}ms, {errors} errors"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--path", default="/api/reservations/braintree/get-client-token/")
+    parser.add_argument("--modes", nargs="+", choices=list(SERVERS), default=list(SERVERS))
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--workers", type=int, default=2, help="Gunicorn worker processes per mode")
+    parser.add_argument("--latency-ms", type=int, default=100, help="Delay of every stub Braintree response")
+    args = parse_args(parser)
+
+    headers = {"Authorization": f"Bearer {AccessToken.for_user(benchmark_user())}", "Host": settings.ALLOWED_HOSTS[0]}
+
+    StubBraintreeHandler.latency = args.latency_ms / 1000
+    stub = ThreadingHTTPServer(("127.0.0.1", 0), StubBraintreeHandler)
+    threading.Thread(target=stub.serve_forever, daemon=True).start()
+
+    try:
+        for mode in args.modes:
+            port = free_port()
+            server = start_server(mode, port, stub.server_address[1], args.workers)
+            try:
+                url = f"http://127.0.0.1:{port}{args.path}"
+                timings, errors, elapsed = asyncio.run(load(url, headers, args.requests, args.concurrency))
+            finally:
+                server.terminate()
+                server.wait()
+            report(mode, timings, errors, elapsed)
+    finally:
+        stub.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,55 @@
+"""
+Shared setup of the benchmark scripts, run from the project root, e.g.:
+
+    DEBUG=True python -m benchmarks.vehicle_search --seed
+
+Importing this module sets up Django, so it comes before any project import. The benchmarks seed and time whatever
+database the settings point at, so they refuse to run unless DEBUG is on or --yes-i-know confirms the database is a
+throwaway one.
+"""
+
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.conf import settings
+import django
+import os
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "vehicles_rental.settings")
+django.setup()
+
+BENCHMARK_EMAIL = "benchmark@vehicles-rental.local"
+
+
+def parse_args(parser):
+    parser.add_argument(
+        "--yes-i-know",
+        action="store_true",
+        help="Run with DEBUG off. Only pass it when the configured database is a throwaway copy.",
+    )
+    args = parser.parse_args()
+
+    if not (settings.DEBUG or args.yes_i_know):
+        database = connections[DEFAULT_DB_ALIAS].settings_dict
+        parser.exit(
+            2,
+            f"{parser.prog}: refusing to run against the {database['ENGINE'].rsplit('.', 1)[-1]} database "
+            f"{database.get('NAME')!r} with DEBUG off. Point the settings at a throwaway database and pass "
+            "--yes-i-know.\n",
+        )
+    return args
+
+
+def benchmark_user():
+    """The client the seeded reservations belong to and the benchmarks authenticate as. It cannot log in."""
+    from user_accounts.models import UserAccount
+
+    user, created = UserAccount.objects.get_or_create(
+        email=BENCHMARK_EMAIL, defaults={"first_name": "Benchmark", "last_name": "Client", "role": "CLIENT"}
+    )
+    if created:
+        user.set_unusable_password()
+        user.save(update_fields=["password"])
+    if user.role != "CLIENT":
+        raise SystemExit(
+            f"{BENCHMARK_EMAIL} already exists with the {user.role} role; the benchmarks only run as a client."
+        )
+    return user
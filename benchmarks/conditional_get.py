@@ -0,0 +1,62 @@
+"""
+Compare the latency of full list responses with 304 answers from their ETag validators. The lists hold the
+reservations of the benchmark client, seeded with `python -m benchmarks.vehicle_search --seed`.
+"""
+
+from benchmarks.common import benchmark_user, parse_args
+from rest_framework.test import APIRequestFactory, force_authenticate
+from reservations.views import list_reservations, list_transactions
+from django.conf import settings
+import statistics
+import argparse
+import time
+
+ENDPOINTS = {
+    "reservations": ("/api/reservations/list/", list_reservations),
+    "transactions": ("/api/reservations/transactions/", list_transactions),
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--endpoints", nargs="+", choices=list(ENDPOINTS), default=list(ENDPOINTS))
+    parser.add_argument("--iterations", type=int, default=20)
+    args = parse_args(parser)
+
+    user = benchmark_user()
+    factory = APIRequestFactory()
+
+    for name in args.endpoints:
+        path, view = ENDPOINTS[name]
+
+        def call(**headers):
+            request = factory.get(path, HTTP_HOST=settings.ALLOWED_HOSTS[0], **headers)
+            force_authenticate(request, user=user)
+            started = time.perf_counter()
+            response = view(request)
+            # 304s are plain Django responses with nothing to render
+            if hasattr(response, "render"):
+                response.render()
+            return response, (time.perf_counter() - started) * 1000
+
+        response, _ = call()
+        etag = response["ETag"]
+
+        full = [call()[1] for _ in range(args.iterations)]
+        conditional = []
+        for _ in range(args.iterations):
+            response, elapsed = call(HTTP_IF_NONE_MATCH=etag)
+            if response.status_code != 304:
+                raise SystemExit(f"Expected 304 from {path}, got {response.status_code}.")
+            conditional.append(elapsed)
+
+        full_median = statistics.median(full)
+        conditional_median = statistics.median(conditional)
+        print(
+            f"{name}: full 200 {full_median:.1f}ms, conditional 304 {conditional_median:.1f}ms "
+            f"({full_median / conditional_median:.0f}x faster)"
+        )
+
+
+if __name__ == "__main__":
+    main()
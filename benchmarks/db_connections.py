@@ -0,0 +1,84 @@
+"""
+Compare the database cost per request of opening a connection every request, persistent connections with health
+checks and the psycopg connection pool. The pool needs PostgreSQL with psycopg 3.
+"""
+
+from benchmarks.common import parse_args
+from django.core.signals import request_finished, request_started
+from django.db import DEFAULT_DB_ALIAS, connections
+from vehicles.models import Vehicle
+from django.conf import settings
+import statistics
+import argparse
+import copy
+import time
+
+MODES = {
+    "per-request": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False},
+    "persistent": {"CONN_MAX_AGE": 600, "CONN_HEALTH_CHECKS": True},
+    "pool": {"CONN_MAX_AGE": 0, "CONN_HEALTH_CHECKS": False, "POOL": True},
+}
+
+
+def add_alias(mode):
+    alias = f"benchmark_{mode}"
+    config = copy.deepcopy(settings.DATABASES[DEFAULT_DB_ALIAS])
+    options = config.setdefault("OPTIONS", {})
+    options.pop("pool", None)
+
+    overrides = dict(MODES[mode])
+    if overrides.pop("POOL", False):
+        options["pool"] = {
+            "min_size": settings.DATABASE_POOL_MIN_SIZE,
+            "max_size": settings.DATABASE_POOL_MAX_SIZE,
+            "timeout": settings.DATABASE_POOL_TIMEOUT,
+        }
+    config.update(overrides)
+
+    databases = {DEFAULT_DB_ALIAS: copy.deepcopy(settings.DATABASES[DEFAULT_DB_ALIAS]), alias: config}
+    connections.settings[alias] = connections.configure_settings(databases)[alias]
+    return alias
+
+
+def request(alias):
+    """One request's worth of queries between the signals Django uses to recycle connections."""
+    started = time.perf_counter()
+    request_started.send(sender=None)
+    try:
+        list(Vehicle.objects.using(alias).filter(is_deleted=False).order_by("id")[:10])
+    finally:
+        request_finished.send(sender=None)
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--modes", nargs="+", choices=list(MODES), default=list(MODES))
+    parser.add_argument("--requests", type=int, default=500)
+    args = parse_args(parser)
+
+    vendor = connections[DEFAULT_DB_ALIAS].vendor
+
+    for mode in args.modes:
+        if MODES[mode].get("POOL") and vendor != "postgresql":
+            print(f"{mode}: skipped, the pool needs PostgreSQL.")
+            continue
+
+        alias = add_alias(mode)
+        try:
+            timings = [request(alias) for _ in range(args.requests)]
+        finally:
+            connection = connections[alias]
+            connection.close()
+            if getattr(connection, "pool", None) is not None:
+                connection.close_pool()
+
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        print(
+            f"{mode}: mean={statistics.mean(timings):.2f}ms p50={percentiles[49]:.2f}ms "
+            f"p99={percentiles[98]:.2f}ms per request"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""Measure renders per second of the email templates with and without the compiled template cache."""
+
+from benchmarks.common import parse_args
+from django.template.loader import render_to_string
+from django.template import Engine
+from utils.email_templates import render_many
+import argparse
+import time
+
+
+def measure(label, render, count):
+    started = time.perf_counter()
+    render()
+    elapsed = time.perf_counter() - started
+    print(f"{label}: {count / elapsed:,.0f} emails/s ({elapsed:.2f}s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--template", default="account_verification")
+    parser.add_argument("--renders", type=int, default=5000)
+    args = parse_args(parser)
+
+    name = args.template
+    contexts = [
+        {"user": {"first_name": f"Client {i}"}, "confirmation_url": f"https://example.com/confirm?token={i}"}
+        for i in range(args.renders)
+    ]
+
+    # What every render paid before: locating, reading and compiling both files from disk
+    uncached = Engine(loaders=["django.template.loaders.app_directories.Loader"])
+
+    def uncached_render(context):
+        for extension in ("txt", "html"):
+            uncached.render_to_string(f"{name}.{extension}", context)
+
+    def loader_render(context):
+        for extension in ("txt", "html"):
+            render_to_string(f"{name}.{extension}", context)
+
+    measure("uncached loader", lambda: [uncached_render(context) for context in contexts], len(contexts))
+    measure("render_to_string", lambda: [loader_render(context) for context in contexts], len(contexts))
+    measure("render_many", lambda: render_many(name, contexts), len(contexts))
+
+
+if __name__ == "__main__":
+    main()
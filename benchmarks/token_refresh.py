@@ -0,0 +1,100 @@
+"""
+Measure refresh token rotation with the blacklist checked in the database and through the bloom filter, optionally
+after seeding millions of historic blacklisted tokens.
+"""
+
+from benchmarks.common import benchmark_user, parse_args
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from user_accounts.tokens import FilteredRefreshToken, blacklist_filter
+from django.test.utils import CaptureQueriesContext, override_settings
+from rest_framework_simplejwt.views import TokenRefreshView
+from rest_framework.test import APIRequestFactory
+from django.db import connection, transaction
+from django.utils import timezone
+from django.conf import settings
+from datetime import timedelta
+import statistics
+import argparse
+import time
+import uuid
+
+
+def seed(total, batch_size):
+    expires_at = timezone.now() + timedelta(days=1)
+    started = time.perf_counter()
+
+    for offset in range(0, total, batch_size):
+        with transaction.atomic():
+            tokens = OutstandingToken.objects.bulk_create(
+                OutstandingToken(jti=uuid.uuid4().hex, token="", expires_at=expires_at)
+                for _ in range(min(batch_size, total - offset))
+            )
+            BlacklistedToken.objects.bulk_create(BlacklistedToken(token=token) for token in tokens)
+
+    print(f"Seeded {total} blacklisted tokens in {time.perf_counter() - started:.1f}s.")
+
+
+def refresh_request(factory, refresh):
+    return factory.post(
+        "/api/accounts/login/refresh/", {"refresh": refresh}, format="json", HTTP_HOST=settings.ALLOWED_HOSTS[0]
+    )
+
+
+def run(user, mode, total):
+    factory = APIRequestFactory()
+    view = TokenRefreshView.as_view()
+    first = refresh = str(FilteredRefreshToken.for_user(user))
+    timings = []
+    queries = 0
+
+    for _ in range(total):
+        request = refresh_request(factory, refresh)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            response = view(request)
+            response.render()
+            timings.append((time.perf_counter() - started) * 1000)
+        if response.status_code != 200:
+            raise SystemExit(f"Refresh failed with {response.status_code}: {response.data}")
+        queries += len(captured)
+        refresh = response.data["refresh"]
+
+    # The rotated token must still be rejected
+    if view(refresh_request(factory, first)).status_code != 401:
+        raise SystemExit(f"{mode}: a blacklisted refresh token was accepted.")
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    print(
+        f"{mode}: {total / (sum(timings) / 1000):.0f} refreshes/s, p50={percentiles[49]:.2f}ms "
+        f"p99={percentiles[98]:.2f}ms, {queries / total:.1f} queries per refresh"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", type=int, default=0, help="Historic blacklisted tokens to insert first")
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--requests", type=int, default=500, help="Refreshes per mode")
+    args = parse_args(parser)
+
+    user = benchmark_user()
+    if args.seed:
+        seed(args.seed, args.batch_size)
+    print(f"{BlacklistedToken.objects.count()} blacklisted tokens in the database.")
+
+    for enabled in [False, True]:
+        with override_settings(TOKEN_BLACKLIST_FILTER_ENABLED=enabled):
+            if enabled:
+                started = time.perf_counter()
+                blacklist_filter.rebuild()
+                if blacklist_filter.filter is None:
+                    raise SystemExit("The blacklist filter could not be built, see the logs.")
+                print(
+                    f"Filter built in {time.perf_counter() - started:.1f}s "
+                    f"({len(blacklist_filter.filter.bits) / 1024 / 1024:.1f} MiB)."
+                )
+            run(user, "filter" if enabled else "database", args.requests)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""Seed a large catalogue (optional) and measure p50/p99 latency of the vehicle search endpoint."""
+
+from benchmarks.common import benchmark_user, parse_args
+from rest_framework.test import APIRequestFactory, force_authenticate
+from reservations.models import Reservation
+from vehicles.models import Vehicle, VehicleDetails
+from vehicles.views import search_vehicles
+from django.utils import timezone
+from django.conf import settings
+from datetime import timedelta
+from decimal import Decimal
+import statistics
+import argparse
+import random
+import time
+
+
+def seed(user, vehicle_count, reservation_count, batch_size):
+    makes = [("Toyota", "Corolla"), ("Honda", "Civic"), ("Hyundai", "Elantra"), ("Kia", "Rio"), ("Ford", "Focus")]
+    vehicle_ids = []
+
+    for offset in range(0, vehicle_count, batch_size):
+        vehicles = []
+        for i in range(offset, min(offset + batch_size, vehicle_count)):
+            make, model = random.choice(makes)
+            price = Decimal(random.randint(20, 250))
+            vehicles.append(
+                Vehicle(
+                    name=f"Benchmark {make} {model} #{i}",
+                    make=make,
+                    model=model,
+                    year=random.randint(2010, 2025),
+                    price=price * 300,
+                    price_per_day=price,
+                    price_per_week=price * 6,
+                    price_per_month=price * 25,
+                    picture1="benchmark.jpg",
+                )
+            )
+        vehicles = Vehicle.objects.bulk_create(vehicles)
+        VehicleDetails.objects.bulk_create(
+            [
+                VehicleDetails(
+                    vehicle=vehicle,
+                    color="White",
+                    is_automatic=random.random() < 0.7,
+                    is_new=random.random() < 0.2,
+                    description="Benchmark vehicle",
+                )
+                for vehicle in vehicles
+            ]
+        )
+        # Only the vehicles created here get reservations, whatever else the catalogue holds
+        vehicle_ids.extend(vehicle.id for vehicle in vehicles)
+    print(f"Seeded {vehicle_count} vehicles.")
+
+    per_vehicle = max(reservation_count // max(len(vehicle_ids), 1), 1)
+    now = timezone.now()
+    batch = []
+    created = 0
+
+    for vehicle_id in vehicle_ids:
+        # Reservations of one vehicle are laid out back to back so they never overlap
+        cursor = now - timedelta(days=180)
+        for _ in range(per_vehicle):
+            start = cursor + timedelta(hours=random.randint(1, 72))
+            end = start + timedelta(days=random.randint(1, 5))
+            cursor = end
+            batch.append(
+                Reservation(
+                    user=user,
+                    vehicle_id=vehicle_id,
+                    start_date=start,
+                    end_date=end,
+                    is_active=end > now,
+                )
+            )
+        if len(batch) >= batch_size:
+            Reservation.objects.bulk_create(batch)
+            created += len(batch)
+            batch = []
+
+    Reservation.objects.bulk_create(batch)
+    created += len(batch)
+    print(f"Seeded {created} reservations.")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--seed", action="store_true", help="Insert the benchmark vehicles and reservations first")
+    parser.add_argument("--vehicles", type=int, default=100_000)
+    parser.add_argument("--reservations", type=int, default=5_000_000)
+    parser.add_argument("--batch-size", type=int, default=10_000)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parse_args(parser)
+
+    user = benchmark_user()
+    if args.seed:
+        seed(user, args.vehicles, args.reservations, args.batch_size)
+
+    factory = APIRequestFactory()
+    now = timezone.now()
+    timings = []
+
+    for _ in range(args.iterations):
+        start = now + timedelta(days=random.randint(1, 180))
+        end = start + timedelta(days=random.randint(1, 14))
+        params = {
+            "start_date": start.strftime("%m/%d/%Y"),
+            "end_date": end.strftime("%m/%d/%Y"),
+            "max_price": random.choice([50, 100, 200]),
+        }
+        if random.random() < 0.5:
+            params["is_automatic"] = random.choice(["true", "false"])
+
+        request = factory.get("/api/vehicles/search/", params, HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        force_authenticate(request, user=user)
+
+        started = time.perf_counter()
+        response = search_vehicles(request)
+        response.render()
+        timings.append((time.perf_counter() - started) * 1000)
+
+        if response.status_code != 200:
+            raise SystemExit(f"Search failed with status {response.status_code}: {response.data}")
+
+    percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+    print(f"{len(timings)} searches: p50={percentiles[49]:.2f}ms p99={percentiles[98]:.2f}ms max={max(timings):.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
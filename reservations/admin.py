@@ -1,7 +1,8 @@
 from django.contrib import admin
-from .models import Reservation, Transaction
+from .models import Reservation, Transaction, WebhookEvent
 
 # Register your models here.
 
 admin.site.register(Reservation)
 admin.site.register(Transaction)
+admin.site.register(WebhookEvent)
@@ -0,0 +1,131 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import CaptureQueriesContext
+from django.db import connections, transaction
+from rest_framework.test import APIClient
+from user_accounts.models import UserAccount
+from django.utils.crypto import get_random_string
+from contextlib import ExitStack
+from django.conf import settings
+import re
+
+# (role, path, query params) of every filter path served by the list, search and report endpoints. Unfiltered
+# pages still count every row, so their COUNT queries are expected to scan.
+ENDPOINTS = [
+    ("ADMINISTRATOR", "/api/vehicles/list/", {}),
+    ("ADMINISTRATOR", "/api/vehicles/list/", {"name_contains": "a"}),
+    ("ADMINISTRATOR", "/api/vehicles/list/", {"start_date": "01/01/2030", "end_date": "01/10/2030"}),
+    ("CLIENT", "/api/vehicles/search/", {"make": "Toyota", "model": "Corolla", "year": "2020"}),
+    ("CLIENT", "/api/vehicles/search/", {"min_price": "10", "max_price": "500"}),
+    ("CLIENT", "/api/vehicles/search/", {"start_date": "01/01/2030", "end_date": "01/10/2030"}),
+    ("ADMINISTRATOR", "/api/reservations/list/", {"page": "1"}),
+    ("ADMINISTRATOR", "/api/reservations/list/", {"status": "active", "page": "1"}),
+    ("ADMINISTRATOR", "/api/reservations/list/", {"status": "canceled", "page": "1"}),
+    ("ADMINISTRATOR", "/api/reservations/list/", {"start_date": "2024-01-01T00:00:00Z", "page": "1"}),
+    ("CLIENT", "/api/reservations/list/", {"start_date": "2024-01-01T00:00:00Z", "page": "1"}),
+    ("ADMINISTRATOR", "/api/reservations/transactions/", {"page": "1"}),
+    ("CLIENT", "/api/reservations/transactions/", {"start_date": "2024-01-01T00:00:00Z", "page": "1"}),
+    ("ADMINISTRATOR", "/api/reservations/report/", {"start_date": "2024-01-01", "end_date": "2030-01-01"}),
+    ("ADMINISTRATOR", "/api/reservations/top-frequent-clients/", {}),
+    ("ADMINISTRATOR", "/api/accounts/users/", {}),
+    ("MANAGER", "/api/accounts/users/", {}),
+    ("CLIENT", "/api/accounts/user/profile/", {}),
+]
+PROFILE_PATH = "/api/accounts/user/profile/"
+
+POSTGRES_SEQ_SCAN = re.compile(r"Seq Scan on (\w+)")
+# SQLite reports "SCAN table" for full scans and "SCAN table USING INDEX ..." for ordered index scans
+SQLITE_SEQ_SCAN = re.compile(r"^SCAN (\w+)\b(?! USING)")
+
+
+class Command(BaseCommand):
+    help = "Run EXPLAIN on the queries every list, search and report endpoint issues and flag sequential scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--planner-defaults",
+            action="store_true",
+            help="Keep sequential scans enabled on PostgreSQL; by default they are disabled, so a remaining "
+            "sequential scan means no index can serve the query even on a large table",
+        )
+        parser.add_argument("--verbose-plans", action="store_true", help="Print the plan of every query")
+        parser.add_argument("--fail", action="store_true", help="Exit with an error when a sequential scan is found")
+
+    def handle(self, *args, **options):
+        settings.ALLOWED_HOSTS.append("testserver")
+        flagged = 0
+
+        for role, path, params in ENDPOINTS:
+            users = UserAccount.objects.filter(role=role, is_active=True)
+            if path == PROFILE_PATH:
+                users = users.filter(account_details__isnull=False)
+            user = users.order_by("id").first()
+            if user is None:
+                self.stdout.write(self.style.WARNING(f"{path} {params}: skipped, no active {role} user matches."))
+                continue
+
+            try:
+                queries = self.capture(user, path, params)
+            except CommandError as e:
+                self.stdout.write(self.style.WARNING(f"{path} {params}: skipped, {e}"))
+                continue
+            scans = []
+            for alias, sql in queries:
+                plan = self.explain(alias, sql, options["planner_defaults"])
+                tables = self.sequential_scans(alias, plan)
+                if tables:
+                    scans.append((tables, sql))
+                if options["verbose_plans"]:
+                    self.stdout.write(f"  {sql}\n    " + "\n    ".join(plan))
+
+            label = f"{path} {params or ''} as {role}: {len(queries)} queries"
+            if not scans:
+                self.stdout.write(self.style.SUCCESS(f"{label}, no sequential scans"))
+                continue
+
+            flagged += len(scans)
+            self.stdout.write(self.style.ERROR(f"{label}, {len(scans)} with sequential scans"))
+            for tables, sql in scans:
+                self.stdout.write(f"  {', '.join(sorted(tables))}: {sql[:300]}")
+
+        if flagged and options["fail"]:
+            raise CommandError(f"{flagged} queries use sequential scans.")
+
+    def capture(self, user, path, params):
+        client = APIClient(raise_request_exception=False)
+        client.force_authenticate(user)
+        # A parameter nobody else sends keeps the response cache from answering instead of the database
+        params = {**params, "explain": get_random_string(12)}
+
+        with ExitStack() as stack:
+            captured = {alias: stack.enter_context(CaptureQueriesContext(connections[alias])) for alias in connections}
+            response = client.get(path, params)
+        if response.status_code >= 400:
+            raise CommandError(f"it answered {response.status_code} as user {user.pk}.")
+
+        queries = []
+        for alias, context in captured.items():
+            for query in context.captured_queries:
+                sql = query["sql"]
+                if sql.lstrip().upper().startswith(("SELECT", "WITH")) and (alias, sql) not in queries:
+                    queries.append((alias, sql))
+        return queries
+
+    def explain(self, alias, sql, planner_defaults):
+        connection = connections[alias]
+        with transaction.atomic(using=alias), connection.cursor() as cursor:
+            if connection.vendor == "postgresql":
+                if not planner_defaults:
+                    cursor.execute("SET LOCAL enable_seqscan = off")
+                cursor.execute(f"EXPLAIN {sql}")
+                return [row[0] for row in cursor.fetchall()]
+            if connection.vendor == "sqlite":
+                cursor.execute(f"EXPLAIN QUERY PLAN {sql}")
+                return [row[-1] for row in cursor.fetchall()]
+        raise CommandError(f"EXPLAIN is not supported for {connection.vendor} databases.")
+
+    def sequential_scans(self, alias, plan):
+        connection = connections[alias]
+        pattern = POSTGRES_SEQ_SCAN if connection.vendor == "postgresql" else SQLITE_SEQ_SCAN
+        # Subqueries and CTEs show up as scans of their alias, only real tables matter
+        tables = set(connection.introspection.table_names())
+        return {match.group(1) for line in plan for match in [pattern.search(line.strip())] if match} & tables
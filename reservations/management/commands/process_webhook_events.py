@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from reservations.models import WebhookEvent
+
+
+class Command(BaseCommand):
+    help = "Apply the pending Braintree webhook events to the transactions in batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=500, help="Number of events applied per transaction")
+
+    def handle(self, *args, **options):
+        processed = updated = 0
+        while True:
+            events, transactions = WebhookEvent.objects.process_batch(options["batch_size"])
+            if not events:
+                break
+            processed += events
+            updated += transactions
+
+        self.stdout.write(self.style.SUCCESS(f"Processed {processed} webhook events, updated {updated} transactions."))
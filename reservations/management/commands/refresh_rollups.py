@@ -0,0 +1,164 @@
+from reservations.models import DeletedReservation, Reservation, RollupState, UserMonthlyRollup, VehicleDailyRollup
+from django.db.models.functions import TruncDate, TruncMonth
+from django.db.models import Count, DateField, F, Max, Min, Q, Sum
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+import time as clock
+
+
+def local_bounds(first_day, last_day):
+    # Local [first_day 00:00, last_day + 1 00:00) so the start_date filter matches TruncDate/TruncMonth buckets
+    tz = timezone.get_current_timezone()
+    return (
+        timezone.make_aware(datetime.combine(first_day, time.min), tz),
+        timezone.make_aware(datetime.combine(last_day + timedelta(days=1), time.min), tz),
+    )
+
+
+def next_month(month):
+    return (month.replace(day=1) + timedelta(days=32)).replace(day=1)
+
+
+class Command(BaseCommand):
+    help = (
+        "Incrementally refresh the per vehicle per day and per user per month rollups of the booked reservations, "
+        "leaving out holds still waiting on their payment"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--full", action="store_true", help="Rebuild the rollups from the whole history")
+        parser.add_argument(
+            "--overlap-minutes",
+            type=int,
+            default=5,
+            help="Re-process changes this far behind the high-water mark to catch late commits",
+        )
+        parser.add_argument("--batch-size", type=int, default=500, help="Vehicles or users recomputed per transaction")
+
+    def handle(self, *args, **options):
+        started = clock.monotonic()
+        state, _ = RollupState.objects.get_or_create(name=RollupState.RESERVATIONS)
+
+        # Captured before reading so changes made while this run is in progress are picked up by the next one
+        now = timezone.now()
+
+        # Deleted reservations leave nothing behind to compare with the high-water mark, so their buckets are
+        # recorded when they are deleted and recomputed here
+        deleted_ids = list(DeletedReservation.objects.values_list("id", flat=True))
+        deleted = DeletedReservation.objects.filter(id__in=deleted_ids)
+
+        full = options["full"] or not state.high_water_mark
+        if full:
+            changed = [Reservation.objects.all(), deleted]
+        else:
+            since = state.high_water_mark - timedelta(minutes=options["overlap_minutes"])
+            changed = [
+                Reservation.objects.filter(updated_at__gt=since),
+                Reservation.objects.filter(transaction__created_at__gt=since),
+                deleted,
+            ]
+
+        vehicle_ranges = self.changed_ranges(changed, "vehicle_id", TruncDate("start_date"))
+        user_ranges = self.changed_ranges(changed, "user_id", TruncMonth("start_date", output_field=DateField()))
+        if full:
+            # Existing buckets are recomputed too, dropping those no remaining reservation falls in
+            self.changed_ranges([VehicleDailyRollup.objects.all()], "vehicle_id", F("day"), vehicle_ranges)
+            self.changed_ranges([UserMonthlyRollup.objects.all()], "user_id", F("month"), user_ranges)
+
+        vehicle_rows = self.refresh(vehicle_ranges, options["batch_size"], self.refresh_vehicles)
+        user_rows = self.refresh(user_ranges, options["batch_size"], self.refresh_users)
+
+        deleted.delete()
+        state.high_water_mark = now
+        state.save()
+
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Rollups refreshed up to {now:%Y-%m-%d %H:%M:%S}: {len(vehicle_ranges)} vehicles "
+                f"({vehicle_rows} daily rows), {len(user_ranges)} users ({user_rows} monthly rows) "
+                f"in {clock.monotonic() - started:.2f}s."
+            )
+        )
+
+    def changed_ranges(self, querysets, key, bucket, ranges=None):
+        # First and last bucket touched by the changed reservations of every vehicle/user
+        ranges = {} if ranges is None else ranges
+        for queryset in querysets:
+            touched = queryset.annotate(bucket=bucket).values(key).annotate(first=Min("bucket"), last=Max("bucket"))
+            for row in touched.order_by():
+                first, last = ranges.get(row[key], (row["first"], row["last"]))
+                ranges[row[key]] = (min(first, row["first"]), max(last, row["last"]))
+        return ranges
+
+    def refresh(self, ranges, batch_size, refresh_batch):
+        keys = sorted(ranges)
+        rows = 0
+        for offset in range(0, len(keys), batch_size):
+            end = offset + batch_size
+            batch = keys[offset:end]
+            first = min(ranges[key][0] for key in batch)
+            last = max(ranges[key][1] for key in batch)
+            with transaction.atomic():
+                rows += refresh_batch(batch, first, last)
+        return rows
+
+    def refresh_vehicles(self, vehicle_ids, first_day, last_day):
+        start, end = local_bounds(first_day, last_day)
+        buckets = (
+            Reservation.objects.booked()
+            .filter(vehicle_id__in=vehicle_ids, start_date__gte=start, start_date__lt=end)
+            .annotate(day=TruncDate("start_date"))
+            .values("vehicle_id", "day")
+            .annotate(
+                bookings=Count("id"),
+                cancellations=Count("id", filter=Q(is_canceled=True)),
+                booked=Sum(F("end_date") - F("start_date"), filter=Q(is_canceled=False)),
+                revenue=Sum("transaction__amount", default=0),
+            )
+            .order_by()
+        )
+        rollups = [
+            VehicleDailyRollup(
+                vehicle_id=bucket["vehicle_id"],
+                day=bucket["day"],
+                bookings=bucket["bookings"],
+                cancellations=bucket["cancellations"],
+                booked_hours=self.hours(bucket["booked"]),
+                revenue=bucket["revenue"],
+            )
+            for bucket in buckets
+        ]
+
+        # Replacing the whole range also drops buckets whose reservations no longer exist
+        VehicleDailyRollup.objects.filter(vehicle_id__in=vehicle_ids, day__gte=first_day, day__lte=last_day).delete()
+        VehicleDailyRollup.objects.bulk_create(rollups)
+        return len(rollups)
+
+    def refresh_users(self, user_ids, first_month, last_month):
+        start, end = local_bounds(first_month, next_month(last_month) - timedelta(days=1))
+        buckets = (
+            Reservation.objects.booked()
+            .filter(user_id__in=user_ids, start_date__gte=start, start_date__lt=end)
+            .annotate(month=TruncMonth("start_date", output_field=DateField()))
+            .values("user_id", "month")
+            .annotate(
+                bookings=Count("id"),
+                cancellations=Count("id", filter=Q(is_canceled=True)),
+                revenue=Sum("transaction__amount", default=0),
+                last_rental_at=Max("start_date", filter=Q(is_canceled=False)),
+            )
+            .order_by()
+        )
+        rollups = [UserMonthlyRollup(**bucket) for bucket in buckets]
+
+        UserMonthlyRollup.objects.filter(user_id__in=user_ids, month__gte=first_month, month__lte=last_month).delete()
+        UserMonthlyRollup.objects.bulk_create(rollups)
+        return len(rollups)
+
+    def hours(self, duration):
+        if not duration:
+            return Decimal(0)
+        return Decimal(duration.total_seconds() / 3600).quantize(Decimal("0.01"))
@@ -0,0 +1,56 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management import call_command
+from django.conf import settings
+from django.test import Client
+from django.urls import reverse
+from utils.braintree_utils import get_braintree_gateway
+import requests
+import json
+
+
+class Command(BaseCommand):
+    help = (
+        "Replay recorded Braintree webhook payloads against the webhook endpoint. Every line of the file is a "
+        'JSON object with "bt_signature" and "bt_payload", as posted by Braintree.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("path", nargs="?", help="JSON lines file with the recorded payloads")
+        parser.add_argument(
+            "--sample",
+            nargs=2,
+            action="append",
+            default=[],
+            metavar=("KIND", "TRANSACTION_ID"),
+            help="Sign a sample notification with the configured Braintree keys instead of reading a file",
+        )
+        parser.add_argument("--url", help="Post to a running server instead of calling the endpoint in-process")
+        parser.add_argument("--process", action="store_true", help="Apply the received events afterwards")
+
+    def handle(self, *args, **options):
+        payloads = self.load(options["path"]) if options["path"] else []
+        gateway = get_braintree_gateway()
+        payloads += [self.sample(gateway, kind, id) for kind, id in options["sample"]]
+        if not payloads:
+            raise CommandError("Nothing to replay, pass a file or --sample.")
+
+        statuses = [self.post(options["url"], payload) for payload in payloads]
+        accepted = statuses.count(200)
+        self.stdout.write(self.style.SUCCESS(f"Replayed {len(payloads)} webhooks, {accepted} accepted."))
+
+        if options["process"]:
+            call_command("process_webhook_events", stdout=self.stdout, stderr=self.stderr)
+
+    def load(self, path):
+        with open(path) as recorded:
+            return [json.loads(line) for line in recorded if line.strip()]
+
+    def sample(self, gateway, kind, id):
+        notification = gateway.webhook_testing.sample_notification(kind, id)
+        return {"bt_signature": notification["bt_signature"], "bt_payload": notification["bt_payload"].decode()}
+
+    def post(self, url, payload):
+        if url:
+            return requests.post(url, data=payload, timeout=30).status_code
+        client = Client(HTTP_HOST=settings.ALLOWED_HOSTS[0])
+        return client.post(reverse("braintree_webhook"), payload).status_code
@@ -0,0 +1,55 @@
+from django.core.management.base import BaseCommand
+from django.core.management import call_command
+from reservations.models import Reservation, VehicleStatusTransition
+from utils.scheduler import Scheduler
+from django.utils import timezone
+import signal
+
+
+class Command(BaseCommand):
+    help = "Run the periodic maintenance jobs in one long-lived process"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--once", action="store_true", help="Run every job once and exit")
+        parser.add_argument("--jitter", type=int, default=30, help="Maximum random delay added to each run (seconds)")
+
+    def handle(self, *args, **options):
+        scheduler = Scheduler()
+        jitter = options["jitter"]
+
+        # Transitions wake the scheduler when the next one is due; the full status sync is only a safety net
+        scheduler.register(
+            "vehicle_status_transitions",
+            self.apply_transitions,
+            60,
+            next_due=VehicleStatusTransition.objects.next_due_at,
+        )
+        scheduler.register("release_expired_holds", self.release_expired_holds, 60, jitter)
+        scheduler.register("process_webhook_events", self.command("process_webhook_events"), 30)
+        scheduler.register("send_queued_emails", self.command("send_queued_emails"), 30)
+        scheduler.register("update_vehicle_status", self.command("update_vehicle_status"), 60 * 60, jitter)
+        scheduler.register("refresh_rollups", self.command("refresh_rollups"), 15 * 60, jitter)
+        scheduler.register("prune_token_blacklist", self.command("prune_token_blacklist"), 6 * 60 * 60, jitter)
+
+        if options["once"]:
+            scheduler.run_all()
+            return
+
+        signal.signal(signal.SIGTERM, scheduler.stop)
+        signal.signal(signal.SIGINT, scheduler.stop)
+
+        self.stdout.write(self.style.SUCCESS(f"Scheduler started with {len(scheduler.jobs)} jobs."))
+        scheduler.run_forever()
+
+    def apply_transitions(self):
+        applied = VehicleStatusTransition.objects.apply_due(timezone.now())
+        if applied:
+            self.stdout.write(self.style.SUCCESS(f"Applied {applied} vehicle status transitions."))
+
+    def release_expired_holds(self):
+        released = Reservation.objects.release_expired_holds(timezone.now())
+        if released:
+            self.stdout.write(self.style.SUCCESS(f"Released {released} expired reservation holds."))
+
+    def command(self, name):
+        return lambda: call_command(name, stdout=self.stdout, stderr=self.stderr)
@@ -1,40 +1,78 @@
 from django.core.management.base import BaseCommand
-from django.utils import timezone
+from django.db.models import Exists, OuterRef
 from reservations.models import Reservation
+from utils.db_locks import advisory_lock
+from vehicles.models import Vehicle
+from vehicles.signals import invalidate_vehicle_cache
+from django.db import transaction
+from django.utils import timezone
+import time
 
 
 class Command(BaseCommand):
     help = "Update vehicle availability based on reservation start and end dates"
 
-    def handle(self, *args, **kwargs):
-        now = timezone.now()
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Commit the updates in chunks of this many rows instead of a single transaction",
+        )
 
-        # Get all active reservations that have passed their end date
-        expired_reservations = Reservation.objects.filter(end_date__lte=now, is_active=True)
+    def handle(self, *args, **options):
+        with advisory_lock("update_vehicle_status") as acquired:
+            if not acquired:
+                self.stdout.write(self.style.WARNING("Another vehicle status update is running, skipping."))
+                return
 
-        for reservation in expired_reservations:
-            vehicle = reservation.vehicle
-            vehicle.is_available = True  # Make the vehicle available again
-            vehicle.save()
+            if options["batch_size"]:
+                self.update(timezone.now(), options["batch_size"])
+            else:
+                with transaction.atomic():
+                    self.update(timezone.now(), None)
 
-            # Mark the reservation as no longer active
-            reservation.is_active = False
-            reservation.save()
+    def update(self, now, batch_size):
+        expired = Reservation.objects.filter(is_active=True, end_date__lte=now)
+        running = Reservation.objects.active().filter(start_date__lte=now, end_date__gt=now)
 
-            self.stdout.write(
-                self.style.SUCCESS(f"Updated reservation {reservation.id}: Vehicle {vehicle.name} is now available.")
-            )
+        # Vehicles whose reservation ended and that have no other reservation running become available again
+        released = Vehicle.objects.filter(
+            Exists(expired.filter(vehicle=OuterRef("pk"))), is_deleted=False, is_available=False
+        ).exclude(Exists(running.filter(vehicle=OuterRef("pk"))))
+        released_count, released_time = self.apply(released, {"is_available": True}, batch_size)
 
-        # Check if there are any upcoming reservations and mark the vehicle unavailable
-        upcoming_reservations = Reservation.objects.filter(start_date__lte=now, end_date__gte=now, is_active=True)
+        # Vehicles with a reservation running right now are unavailable
+        occupied = Vehicle.objects.filter(Exists(running.filter(vehicle=OuterRef("pk"))), is_available=True)
+        occupied_count, occupied_time = self.apply(occupied, {"is_available": False}, batch_size)
 
-        for reservation in upcoming_reservations:
-            vehicle = reservation.vehicle
-            vehicle.is_available = False  # Make the vehicle unavailable
-            vehicle.save()
+        closed_count, closed_time = self.apply(expired, {"is_active": False}, batch_size)
+        if released_count or occupied_count:
+            invalidate_vehicle_cache()
 
-            self.stdout.write(
-                self.style.SUCCESS(f"Updated reservation {reservation.id}: Vehicle {vehicle.name} is now unavailable.")
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"Vehicle status update complete: {released_count} vehicles released ({released_time:.3f}s), "
+                f"{occupied_count} vehicles occupied ({occupied_time:.3f}s), "
+                f"{closed_count} reservations closed ({closed_time:.3f}s)."
             )
+        )
+
+    def apply(self, queryset, values, batch_size):
+        started = time.monotonic()
+        # QuerySet.update() skips auto_now, and the ETags of the list endpoints are built from updated_at
+        values = {**values, "updated_at": timezone.now()}
+
+        if not batch_size:
+            return queryset.update(**values), time.monotonic() - started
+
+        # Every batch drops out of the queryset once updated, so re-reading the first ids walks the backlog
+        updated = 0
+        while True:
+            ids = list(queryset.values_list("id", flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                updated += queryset.model.objects.filter(id__in=ids).update(**values)
 
-        self.stdout.write(self.style.SUCCESS("Vehicle status update complete."))
+        return updated, time.monotonic() - started
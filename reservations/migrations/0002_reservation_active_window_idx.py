@@ -0,0 +1,80 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:06
+
+from collections import defaultdict
+from django.conf import settings
+from django.db import migrations, models
+
+
+def check_no_overlapping_reservations(apps, schema_editor):
+    """
+    Double bookings made before the availability checks existed would make the exclusion constraint fail. They may
+    be paid, so the migration stops and lists them for an operator to cancel or move instead of picking one.
+    """
+    if schema_editor.connection.vendor != "postgresql":
+        return
+
+    Reservation = apps.get_model("reservations", "Reservation")
+    reservations = (
+        Reservation.objects.using(schema_editor.connection.alias)
+        .filter(is_active=True, is_canceled=False)
+        .order_by("vehicle_id", "created_at", "id")
+        .values_list("id", "vehicle_id", "start_date", "end_date")
+    )
+
+    booked = defaultdict(list)
+    overlapping = []
+    for reservation_id, vehicle_id, start_date, end_date in reservations.iterator():
+        earlier = [
+            booked_id
+            for booked_id, booked_start, booked_end in booked[vehicle_id]
+            if start_date < booked_end and end_date > booked_start
+        ]
+        if earlier:
+            overlapping.append(f"{reservation_id} (overlaps {', '.join(map(str, earlier))})")
+        booked[vehicle_id].append((reservation_id, start_date, end_date))
+
+    if overlapping:
+        raise RuntimeError(
+            f"{len(overlapping)} active reservations overlap an earlier booking of the same vehicle: "
+            f"{'; '.join(overlapping)}. Cancel or deactivate one of each pair, then run the migration again."
+        )
+
+
+def add_no_overlap_constraint(apps, schema_editor):
+    # Exclusion constraints need btree_gist for the "vehicle_id WITH =" part and only exist on PostgreSQL
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist")
+    schema_editor.execute(
+        "ALTER TABLE reservations_reservation ADD CONSTRAINT reservation_no_overlap "
+        "EXCLUDE USING gist (vehicle_id WITH =, tstzrange(start_date, end_date, '[)') WITH &&) "
+        "WHERE (is_active AND NOT is_canceled)"
+    )
+
+
+def remove_no_overlap_constraint(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("ALTER TABLE reservations_reservation DROP CONSTRAINT IF EXISTS reservation_no_overlap")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0001_initial"),
+        ("vehicles", "0004_vehicle_is_deleted"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("is_active", True), ("is_canceled", False)),
+                fields=["vehicle", "start_date", "end_date"],
+                name="reservation_active_window_idx",
+            ),
+        ),
+        migrations.RunPython(check_no_overlapping_reservations, migrations.RunPython.noop),
+        migrations.RunPython(add_no_overlap_constraint, remove_no_overlap_constraint),
+    ]
@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:09
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0002_reservation_active_window_idx"),
+        ("vehicles", "0005_vehicle_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["created_at", "id"], name="reservation_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["user", "created_at", "id"], name="reservation_user_created_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["created_at", "id"], name="transaction_created_idx"),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:11
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0003_keyset_pagination_indexes"),
+        ("vehicles", "0005_vehicle_search_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="RollupState",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("name", models.CharField(max_length=100, unique=True)),
+                ("high_water_mark", models.DateTimeField(blank=True, null=True)),
+                ("updated_at", models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="UserMonthlyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("month", models.DateField()),
+                ("bookings", models.PositiveIntegerField(default=0)),
+                ("cancellations", models.PositiveIntegerField(default=0)),
+                ("revenue", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("last_rental_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name="VehicleDailyRollup",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("day", models.DateField()),
+                ("bookings", models.PositiveIntegerField(default=0)),
+                ("cancellations", models.PositiveIntegerField(default=0)),
+                ("booked_hours", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ("revenue", models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["updated_at"], name="reservation_updated_idx"),
+        ),
+        migrations.AddField(
+            model_name="usermonthlyrollup",
+            name="user",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name="monthly_rollups", to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.AddField(
+            model_name="vehicledailyrollup",
+            name="vehicle",
+            field=models.ForeignKey(
+                on_delete=django.db.models.deletion.CASCADE, related_name="daily_rollups", to="vehicles.vehicle"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="usermonthlyrollup",
+            index=models.Index(fields=["month"], name="user_monthly_rollup_month_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="usermonthlyrollup",
+            constraint=models.UniqueConstraint(fields=("user", "month"), name="user_monthly_rollup_unique"),
+        ),
+        migrations.AddIndex(
+            model_name="vehicledailyrollup",
+            index=models.Index(fields=["day"], name="vehicle_daily_rollup_day_idx"),
+        ),
+        migrations.AddConstraint(
+            model_name="vehicledailyrollup",
+            constraint=models.UniqueConstraint(fields=("vehicle", "day"), name="vehicle_daily_rollup_unique"),
+        ),
+    ]
@@ -0,0 +1,73 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+def schedule_pending_transitions(apps, schema_editor):
+    # Reservations created before the transitions queue existed still need their start/end events
+    Reservation = apps.get_model("reservations", "Reservation")
+    VehicleStatusTransition = apps.get_model("reservations", "VehicleStatusTransition")
+    now = timezone.now()
+
+    transitions = []
+    for reservation in Reservation.objects.filter(is_active=True, is_canceled=False, end_date__gt=now).iterator():
+        if reservation.start_date > now:
+            transitions.append(
+                VehicleStatusTransition(
+                    reservation_id=reservation.id,
+                    vehicle_id=reservation.vehicle_id,
+                    kind="START",
+                    due_at=reservation.start_date,
+                )
+            )
+        transitions.append(
+            VehicleStatusTransition(
+                reservation_id=reservation.id,
+                vehicle_id=reservation.vehicle_id,
+                kind="END",
+                due_at=reservation.end_date,
+            )
+        )
+    VehicleStatusTransition.objects.bulk_create(transitions, batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0004_reporting_rollups"),
+        ("vehicles", "0005_vehicle_search_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="VehicleStatusTransition",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("kind", models.CharField(choices=[("START", "Start"), ("END", "End")], max_length=10)),
+                ("due_at", models.DateTimeField()),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+                (
+                    "reservation",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="status_transitions",
+                        to="reservations.reservation",
+                    ),
+                ),
+                ("vehicle", models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to="vehicles.vehicle")),
+            ],
+            options={
+                "indexes": [
+                    models.Index(
+                        condition=models.Q(("processed_at__isnull", True)),
+                        fields=["due_at"],
+                        name="transition_pending_due_idx",
+                    )
+                ],
+            },
+        ),
+        migrations.RunPython(schedule_pending_transitions, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0005_vehicle_status_transitions"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="reservation",
+            name="hold_expires_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
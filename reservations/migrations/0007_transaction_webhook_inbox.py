@@ -0,0 +1,44 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0006_reservation_hold_expires_at"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="WebhookEvent",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("event_id", models.CharField(max_length=64, unique=True)),
+                ("kind", models.CharField(max_length=100)),
+                ("braintree_transaction_id", models.CharField(blank=True, max_length=255)),
+                ("status", models.CharField(blank=True, max_length=50)),
+                ("occurred_at", models.DateTimeField()),
+                ("payload", models.TextField()),
+                ("received_at", models.DateTimeField(auto_now_add=True)),
+                ("processed_at", models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name="transaction",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name="transaction",
+            index=models.Index(fields=["braintree_transaction_id"], name="transaction_braintree_id_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="webhookevent",
+            index=models.Index(
+                condition=models.Q(("processed_at__isnull", True)),
+                fields=["occurred_at", "id"],
+                name="webhook_event_pending_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:41
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0007_transaction_webhook_inbox"),
+        ("vehicles", "0006_filter_indexes"),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["start_date", "end_date"], name="reservation_start_end_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(fields=["user", "start_date"], name="reservation_user_start_idx"),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("is_active", True), ("is_canceled", False)),
+                fields=["created_at", "id"],
+                name="reservation_active_list_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("is_canceled", True)),
+                fields=["created_at", "id"],
+                name="reservation_canceled_list_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="reservation",
+            index=models.Index(
+                condition=models.Q(("hold_expires_at__isnull", False), ("is_active", True), ("is_canceled", False)),
+                fields=["hold_expires_at"],
+                name="reservation_hold_expiry_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0008_filter_indexes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="DeletedReservation",
+            fields=[
+                ("id", models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name="ID")),
+                ("vehicle_id", models.IntegerField()),
+                ("user_id", models.IntegerField()),
+                ("start_date", models.DateTimeField()),
+                ("deleted_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
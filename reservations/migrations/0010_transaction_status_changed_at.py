@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("reservations", "0009_deleted_reservation"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="transaction",
+            name="status_changed_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
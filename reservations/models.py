@@ -1,6 +1,63 @@
-from django.db import models
+import hashlib
+from django.db import models, transaction
 from django.conf import settings
+from django.utils import timezone
+from datetime import timedelta, timezone as dt_timezone
 from vehicles.models import Vehicle
+from vehicles.signals import invalidate_vehicle_cache
+
+
+class VehicleUnavailable(Exception):
+    pass
+
+
+class ReservationQuerySet(models.QuerySet):
+    def active(self):
+        # Matches the condition of the partial "reservation_active_window_idx" index.
+        return self.filter(is_active=True, is_canceled=False)
+
+    def overlapping(self, start_date, end_date):
+        # Half-open intervals: a reservation ending exactly when another starts does not overlap.
+        return self.filter(start_date__lt=end_date, end_date__gt=start_date)
+
+    def is_vehicle_free(self, vehicle, start_date, end_date):
+        return not self.active().overlapping(start_date, end_date).filter(vehicle=vehicle).exists()
+
+    def booked(self):
+        # Holds only become bookings once confirm_hold clears their expiry
+        return self.filter(hold_expires_at__isnull=True)
+
+    def expired_holds(self, now):
+        return self.active().filter(hold_expires_at__lte=now)
+
+    def release_expired_holds(self, now):
+        """Releases holds whose payment never completed and returns how many were released."""
+        # The conditional UPDATE cannot race with confirm_hold, which only confirms active holds
+        released = self.expired_holds(now).update(is_active=False, is_canceled=True, updated_at=now)
+        self.filter(hold_expires_at__isnull=False, is_canceled=True).delete()
+        return released
+
+    def place_hold(self, user, vehicle_id, start_date, end_date):
+        """
+        Reserves the vehicle for a limited time while the payment is processed. The vehicle row lock
+        serializes concurrent bookings of the same vehicle so they cannot both see it as free.
+        """
+        with transaction.atomic():
+            vehicle = Vehicle.objects.select_for_update().get(id=vehicle_id, is_deleted=False)
+            now = timezone.now()
+
+            self.filter(vehicle=vehicle).release_expired_holds(now)
+            if not self.is_vehicle_free(vehicle, start_date, end_date):
+                raise VehicleUnavailable("Vehicle is not available for the selected dates.")
+
+            return self.create(
+                user=user,
+                vehicle=vehicle,
+                start_date=start_date,
+                end_date=end_date,
+                is_active=True,
+                hold_expires_at=now + timedelta(seconds=settings.RESERVATION_HOLD_SECONDS),
+            )
 
 
 class Reservation(models.Model):
@@ -13,14 +70,83 @@ class Reservation(models.Model):
     is_canceled = models.BooleanField(default=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Set while the reservation is only held for a payment in progress
+    hold_expires_at = models.DateTimeField(blank=True, null=True)
+
+    objects = ReservationQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["vehicle", "start_date", "end_date"],
+                condition=models.Q(is_active=True, is_canceled=False),
+                name="reservation_active_window_idx",
+            ),
+            models.Index(fields=["created_at", "id"], name="reservation_created_idx"),
+            models.Index(fields=["user", "created_at", "id"], name="reservation_user_created_idx"),
+            models.Index(fields=["updated_at"], name="reservation_updated_idx"),
+            # start_date/end_date filters of the reservation and transaction lists and the report windows
+            models.Index(fields=["start_date", "end_date"], name="reservation_start_end_idx"),
+            models.Index(fields=["user", "start_date"], name="reservation_user_start_idx"),
+            # ?status=active and ?status=canceled lists, newest first
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(is_active=True, is_canceled=False),
+                name="reservation_active_list_idx",
+            ),
+            models.Index(
+                fields=["created_at", "id"],
+                condition=models.Q(is_canceled=True),
+                name="reservation_canceled_list_idx",
+            ),
+            # release_expired_holds, run every minute by the scheduler
+            models.Index(
+                fields=["hold_expires_at"],
+                condition=models.Q(is_active=True, is_canceled=False, hold_expires_at__isnull=False),
+                name="reservation_hold_expiry_idx",
+            ),
+        ]
 
     def cancel_reservation(self):
         self.is_canceled = True
         self.is_active = False
-        self.vehicle.is_available = True
-        self.vehicle.save()
         self.save()
 
+        # Pending start/end transitions of a canceled reservation must never fire
+        self.status_transitions.pending().delete()
+
+        # The vehicle only becomes available if no other reservation is currently running on it
+        now = timezone.now()
+        self.vehicle.is_available = not self.vehicle.is_deleted and Reservation.objects.is_vehicle_free(
+            self.vehicle, now, now + timedelta(seconds=1)
+        )
+        self.vehicle.save()
+
+    def confirm_hold(self, braintree_transaction):
+        """Turns the hold into a booking once paid. Returns False if the hold was released meanwhile."""
+        with transaction.atomic():
+            confirmed = Reservation.objects.active().filter(id=self.id, hold_expires_at__isnull=False)
+            if not confirmed.update(hold_expires_at=None, updated_at=timezone.now()):
+                return False
+
+            self.hold_expires_at = None
+            Transaction.objects.create(
+                reservation=self,
+                braintree_transaction_id=braintree_transaction.id,
+                amount=braintree_transaction.amount,
+                status=braintree_transaction.status,
+            )
+
+            # The vehicle availability flips exactly when the reservation starts and ends
+            VehicleStatusTransition.schedule(self)
+        return True
+
+    def release_hold(self):
+        Reservation.objects.filter(id=self.id, hold_expires_at__isnull=False).delete()
+
+    async def arelease_hold(self):
+        await Reservation.objects.filter(id=self.id, hold_expires_at__isnull=False).adelete()
+
     def __str__(self):
         return f"Reservation for {self.vehicle} by {self.user} from {self.start_date} to {self.end_date}"
 
@@ -30,7 +156,263 @@ class Transaction(models.Model):
     braintree_transaction_id = models.CharField(max_length=255)
     amount = models.DecimalField(max_digits=10, decimal_places=2)
     status = models.CharField(max_length=50)
+    # When the webhook event that set the status occurred at Braintree, so older redeliveries are ignored
+    status_changed_at = models.DateTimeField(blank=True, null=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["created_at", "id"], name="transaction_created_idx"),
+            models.Index(fields=["braintree_transaction_id"], name="transaction_braintree_id_idx"),
+        ]
 
     def __str__(self):
         return f"Transaction {self.braintree_transaction_id} for Reservation {self.reservation.id}"
+
+
+class WebhookEventQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(processed_at__isnull=True)
+
+    def record(self, notification, payload):
+        """Appends a verified notification to the inbox. Returns False if it was already received."""
+        transaction_status = getattr(notification, "transaction", None)
+        occurred_at = notification.timestamp
+        if timezone.is_naive(occurred_at):
+            occurred_at = timezone.make_aware(occurred_at, dt_timezone.utc)
+
+        _, created = self.get_or_create(
+            event_id=self.model.event_id_for(payload),
+            defaults={
+                "kind": notification.kind,
+                "braintree_transaction_id": transaction_status.id if transaction_status else "",
+                "status": transaction_status.status if transaction_status else "",
+                "occurred_at": occurred_at,
+                "payload": payload,
+            },
+        )
+        return created
+
+    def process_batch(self, limit=500):
+        """
+        Applies the latest status of every transaction in the next batch of pending events with one
+        bulk_update, then marks the batch processed. Events that occurred before the status already
+        applied to a transaction are skipped. Returns (events processed, transactions updated).
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            events = list(self.pending().select_for_update(skip_locked=True).order_by("occurred_at", "id")[:limit])
+            if not events:
+                return 0, 0
+
+            latest_event = {event.braintree_transaction_id: event for event in events if event.braintree_transaction_id}
+            changed = [
+                payment
+                for payment in Transaction.objects.filter(braintree_transaction_id__in=latest_event)
+                if payment.status_changed_at is None
+                or payment.status_changed_at < latest_event[payment.braintree_transaction_id].occurred_at
+            ]
+            for payment in changed:
+                event = latest_event[payment.braintree_transaction_id]
+                payment.status = event.status
+                payment.status_changed_at = event.occurred_at
+                payment.updated_at = now
+            Transaction.objects.bulk_update(changed, ["status", "status_changed_at", "updated_at"], batch_size=limit)
+
+            self.filter(id__in=[event.id for event in events]).update(processed_at=now)
+        return len(events), len(changed)
+
+
+class WebhookEvent(models.Model):
+    """Braintree webhook notifications received but not necessarily applied yet."""
+
+    # sha256 of the signed payload, so redelivered notifications are stored once
+    event_id = models.CharField(max_length=64, unique=True)
+    kind = models.CharField(max_length=100)
+    braintree_transaction_id = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=50, blank=True)
+    occurred_at = models.DateTimeField()
+    payload = models.TextField()
+    received_at = models.DateTimeField(auto_now_add=True)
+    processed_at = models.DateTimeField(blank=True, null=True)
+
+    objects = WebhookEventQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["occurred_at", "id"],
+                condition=models.Q(processed_at__isnull=True),
+                name="webhook_event_pending_idx",
+            ),
+        ]
+
+    @staticmethod
+    def event_id_for(payload):
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def __str__(self):
+        return f"{self.kind} webhook for transaction {self.braintree_transaction_id or '-'}"
+
+
+class VehicleStatusTransitionQuerySet(models.QuerySet):
+    def pending(self):
+        return self.filter(processed_at__isnull=True)
+
+    def next_due_at(self):
+        return self.pending().order_by("due_at").values_list("due_at", flat=True).first()
+
+    def apply_due(self, now, limit=100):
+        """Applies the transitions due by `now` in due order and returns how many were applied."""
+        with transaction.atomic():
+            transitions = list(
+                self.pending()
+                .filter(due_at__lte=now)
+                .select_related("reservation")
+                .select_for_update(skip_locked=True, of=("self",))
+                .order_by("due_at", "id")[:limit]
+            )
+            for status_transition in transitions:
+                status_transition.apply(now)
+        return len(transitions)
+
+
+class VehicleStatusTransition(models.Model):
+    """A pending vehicle availability change at the start or end of a reservation."""
+
+    START = "START"
+    END = "END"
+    KINDS = [(START, "Start"), (END, "End")]
+
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name="status_transitions")
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    due_at = models.DateTimeField()
+    processed_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = VehicleStatusTransitionQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["due_at"], condition=models.Q(processed_at__isnull=True), name="transition_pending_due_idx"
+            ),
+        ]
+
+    @classmethod
+    def schedule(cls, reservation):
+        cls.objects.bulk_create(
+            [
+                cls(
+                    reservation=reservation,
+                    vehicle_id=reservation.vehicle_id,
+                    kind=cls.START,
+                    due_at=reservation.start_date,
+                ),
+                cls(
+                    reservation=reservation,
+                    vehicle_id=reservation.vehicle_id,
+                    kind=cls.END,
+                    due_at=reservation.end_date,
+                ),
+            ]
+        )
+
+    def apply(self, now):
+        reservation = self.reservation
+        vehicles = Vehicle.objects.filter(id=self.vehicle_id)
+
+        # QuerySet.update() skips auto_now, and the list ETags are built from updated_at
+        if self.kind == self.START and reservation.is_active and not reservation.is_canceled:
+            vehicles.update(is_available=False, updated_at=timezone.now())
+        elif self.kind == self.END:
+            Reservation.objects.filter(id=reservation.id, is_active=True).update(
+                is_active=False, updated_at=timezone.now()
+            )
+            running = Reservation.objects.active().filter(
+                vehicle_id=self.vehicle_id, start_date__lte=now, end_date__gt=now
+            )
+            vehicles.filter(is_deleted=False).exclude(models.Exists(running)).update(
+                is_available=True, updated_at=timezone.now()
+            )
+        invalidate_vehicle_cache([self.vehicle_id])
+
+        self.processed_at = now
+        self.save(update_fields=["processed_at"])
+
+    def __str__(self):
+        return f"{self.kind} of reservation {self.reservation_id} at {self.due_at}"
+
+
+class VehicleDailyRollup(models.Model):
+    """Reservations of a vehicle aggregated by the local day they start on."""
+
+    vehicle = models.ForeignKey(Vehicle, on_delete=models.CASCADE, related_name="daily_rollups")
+    day = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    booked_hours = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["vehicle", "day"], name="vehicle_daily_rollup_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["day"], name="vehicle_daily_rollup_day_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.vehicle} on {self.day}: {self.bookings} bookings"
+
+
+class UserMonthlyRollup(models.Model):
+    """Reservations of a user aggregated by the local month they start in."""
+
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, related_name="monthly_rollups")
+    month = models.DateField()
+    bookings = models.PositiveIntegerField(default=0)
+    cancellations = models.PositiveIntegerField(default=0)
+    revenue = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    last_rental_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=["user", "month"], name="user_monthly_rollup_unique"),
+        ]
+        indexes = [
+            models.Index(fields=["month"], name="user_monthly_rollup_month_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.user} in {self.month:%Y-%m}: {self.bookings} bookings"
+
+
+class RollupState(models.Model):
+    """High-water mark up to which reservation changes have been folded into the rollup tables."""
+
+    RESERVATIONS = "reservations"
+
+    name = models.CharField(max_length=100, unique=True)
+    high_water_mark = models.DateTimeField(blank=True, null=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.name} rollups up to {self.high_water_mark}"
+
+
+class DeletedReservation(models.Model):
+    """
+    A deleted reservation whose rollup buckets `refresh_rollups` still has to recompute. The ids are plain integers
+    because the user or vehicle may be deleted along with it.
+    """
+
+    vehicle_id = models.IntegerField()
+    user_id = models.IntegerField()
+    start_date = models.DateTimeField()
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Reservation of vehicle {self.vehicle_id} starting {self.start_date} deleted at {self.deleted_at}"
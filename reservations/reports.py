@@ -0,0 +1,245 @@
+"""
+Report aggregations. Reports count the booked reservations (paid, not holds) that start within the requested
+window, which is also how the rollup tables maintained by the `refresh_rollups` command attribute them: to the local
+day they start on. The rollups answer when the window is made of whole local days and they were refreshed within
+ROLLUP_MAX_LAG_SECONDS, the live reservations otherwise. Every report says which source answered and how current
+its data is in `source` and `as_of`.
+"""
+
+from .models import Reservation, RollupState, Transaction, VehicleDailyRollup
+from django.utils.dateparse import parse_date, parse_datetime
+from vehicles.serializers import VehicleDetailsSerializer
+from django.db.models import Avg, Count, DateField, F, Max, Q, Sum, Window
+from user_accounts.models import UserAccount
+from django.db.models.functions import RowNumber, Trunc
+from vehicles.models import Vehicle
+from django.utils import timezone
+from django.conf import settings
+from datetime import datetime, time, timedelta
+
+REPORT_PERIODS = ["day", "week", "month"]
+
+
+def parse_report_date(value):
+    """Aware datetime for an ISO date or datetime query parameter, None if it cannot be parsed."""
+    try:
+        parsed = parse_datetime(value)
+        if parsed is None and parse_date(value) is not None:
+            parsed = datetime.combine(parse_date(value), time.min)
+    except ValueError:
+        return None
+    if parsed is not None and timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def report_window(start_date=None, end_date=None):
+    """
+    [lower, upper) bounds on the reservations' start for the start_date and end_date query parameters, None where
+    one is missing. A date without a time stands for the whole local day, so the end date is included.
+    Raises ValueError when a parameter cannot be parsed.
+    """
+    bounds = []
+    for value in (start_date, end_date):
+        bound = parse_report_date(value) if value else None
+        if value and bound is None:
+            raise ValueError(f"{value!r} is not an ISO date or datetime.")
+        bounds.append(bound)
+
+    lower, upper = bounds
+    if end_date and parse_date(end_date) is not None:
+        upper += timedelta(days=1)
+    return lower, upper
+
+
+def booked_within(lower=None, upper=None, prefix=""):
+    window = Q(**{f"{prefix}hold_expires_at__isnull": True})
+    if lower:
+        window &= Q(**{f"{prefix}start_date__gte": lower})
+    if upper:
+        window &= Q(**{f"{prefix}start_date__lt": upper})
+    return window
+
+
+def rollup_days(lower=None, upper=None, prefix=""):
+    window = Q()
+    if lower:
+        window &= Q(**{f"{prefix}day__gte": timezone.localdate(lower)})
+    if upper:
+        window &= Q(**{f"{prefix}day__lt": timezone.localdate(upper)})
+    return window
+
+
+def is_local_midnight(bound):
+    return bound is None or timezone.localtime(bound).time() == time.min
+
+
+def rollups_as_of(lower=None, upper=None):
+    """
+    High-water mark of the rollups when they can answer for the window, None when the live tables must: the
+    daily buckets cannot split a day, and reports accept at most ROLLUP_MAX_LAG_SECONDS old data.
+    """
+    if not (is_local_midnight(lower) and is_local_midnight(upper)):
+        return None
+
+    high_water_mark = (
+        RollupState.objects.filter(name=RollupState.RESERVATIONS).values_list("high_water_mark", flat=True).first()
+    )
+    if high_water_mark is None or high_water_mark < timezone.now() - timedelta(seconds=settings.ROLLUP_MAX_LAG_SECONDS):
+        return None
+    return high_water_mark
+
+
+def serialize_cars(vehicles):
+    cars = []
+    for vehicle in vehicles:
+        vehicle_details = getattr(vehicle, "vehicledetails", None)
+        cars.append(
+            {
+                "vehicle_name": vehicle.name,
+                "request_count": vehicle.request_count,
+                "vehicle_details": (
+                    VehicleDetailsSerializer(vehicle_details).data if vehicle_details else "No details available"
+                ),
+            }
+        )
+    return cars
+
+
+def live_report(lower=None, upper=None, top=3, period="month"):
+    as_of = timezone.now()
+    reservations = Reservation.objects.filter(booked_within(lower, upper))
+
+    # Counts, vehicle and details come from one grouped query joined to the reservations in the window
+    most_requested = (
+        Vehicle.objects.filter(Q(reservation__isnull=False) & booked_within(lower, upper, "reservation__"))
+        .select_related("vehicledetails")
+        .annotate(request_count=Count("reservation"))
+        .order_by("-request_count", "id")[:top]
+    )
+
+    summary = reservations.aggregate(
+        total_income=Sum("transaction__amount"),
+        reservation_count=Count("id"),
+        canceled_count=Count("id", filter=Q(is_canceled=True)),
+        average_rental_duration=Avg(F("end_date") - F("start_date"), filter=Q(is_canceled=False)),
+    )
+
+    revenue_by_period = (
+        reservations.annotate(period=Trunc("start_date", period, output_field=DateField()))
+        .values("period")
+        .annotate(revenue=Sum("transaction__amount", default=0), reservation_count=Count("id"))
+        .order_by("period")
+    )
+
+    revenue_by_model = (
+        reservations.values(make=F("vehicle__make"), model=F("vehicle__model"))
+        .annotate(revenue=Sum("transaction__amount", default=0), reservation_count=Count("id"))
+        .order_by("-revenue", "make", "model")
+    )
+
+    return format_report("live", as_of, serialize_cars(most_requested), summary, revenue_by_period, revenue_by_model)
+
+
+def rollup_report(as_of, lower=None, upper=None, top=3, period="month"):
+    rollups = VehicleDailyRollup.objects.filter(rollup_days(lower, upper))
+
+    most_requested = (
+        Vehicle.objects.filter(Q(daily_rollups__isnull=False) & rollup_days(lower, upper, "daily_rollups__"))
+        .select_related("vehicledetails")
+        .annotate(request_count=Sum("daily_rollups__bookings"))
+        .order_by("-request_count", "id")[:top]
+    )
+
+    summary = rollups.aggregate(
+        total_income=Sum("revenue"),
+        reservation_count=Sum("bookings"),
+        canceled_count=Sum("cancellations"),
+        booked_hours=Sum("booked_hours"),
+    )
+    completed = (summary["reservation_count"] or 0) - (summary["canceled_count"] or 0)
+    summary["average_rental_duration"] = (
+        timedelta(hours=float(summary["booked_hours"]) / completed) if completed > 0 else None
+    )
+
+    revenue_by_period = (
+        rollups.annotate(period=Trunc("day", period, output_field=DateField()))
+        .values("period")
+        .annotate(revenue=Sum("revenue"), reservation_count=Sum("bookings"))
+        .order_by("period")
+    )
+
+    revenue_by_model = (
+        rollups.values(make=F("vehicle__make"), model=F("vehicle__model"))
+        .annotate(revenue=Sum("revenue"), reservation_count=Sum("bookings"))
+        .order_by("-revenue", "make", "model")
+    )
+
+    return format_report("rollup", as_of, serialize_cars(most_requested), summary, revenue_by_period, revenue_by_model)
+
+
+def format_report(source, as_of, most_requested, summary, revenue_by_period, revenue_by_model):
+    reservation_count = summary["reservation_count"] or 0
+    average_duration = summary["average_rental_duration"]
+
+    return {
+        "source": source,
+        # Changes made after this instant are not included yet
+        "as_of": as_of,
+        "most_requested_cars": most_requested,
+        "total_income": summary["total_income"] or 0,
+        "reservation_count": reservation_count,
+        "cancellation_rate": (
+            round((summary["canceled_count"] or 0) / reservation_count, 4) if reservation_count else 0
+        ),
+        "average_rental_days": round(average_duration.total_seconds() / 86400, 2) if average_duration else 0,
+        "revenue_by_period": list(revenue_by_period),
+        "revenue_by_model": list(revenue_by_model),
+    }
+
+
+def compile_report(lower=None, upper=None, top=3, period="month"):
+    as_of = rollups_as_of(lower, upper)
+    if as_of is not None:
+        return rollup_report(as_of, lower, upper, top, period)
+    return live_report(lower, upper, top, period)
+
+
+def top_clients(top=5, lower=None, upper=None):
+    """
+    Users with the most booked reservations starting in the window, annotated with `reservation_count`,
+    `total_spent` and `last_rental_date`. The monthly rollups only answer all-time rankings since they cannot
+    split a month.
+    """
+    if not (lower or upper) and rollups_as_of() is not None:
+        clients = UserAccount.objects.filter(monthly_rollups__isnull=False).annotate(
+            reservation_count=Sum("monthly_rollups__bookings"),
+            total_spent=Sum("monthly_rollups__revenue"),
+            last_rental_date=Max("monthly_rollups__last_rental_at"),
+        )
+    else:
+        clients = UserAccount.objects.filter(
+            Q(reservation__isnull=False) & booked_within(lower, upper, "reservation__")
+        ).annotate(
+            reservation_count=Count("reservation"),
+            total_spent=Sum("reservation__transaction__amount", default=0),
+            last_rental_date=Max("reservation__start_date", filter=Q(reservation__is_canceled=False)),
+        )
+
+    return clients.order_by("-reservation_count", "id")[:top]
+
+
+def recent_transactions(user_ids, limit, lower=None, upper=None):
+    """The latest `limit` transactions of every user, fetched for all of them in a single query."""
+    return (
+        Transaction.objects.filter(Q(reservation__user_id__in=user_ids) & booked_within(lower, upper, "reservation__"))
+        .annotate(
+            user_rank=Window(
+                RowNumber(),
+                partition_by=F("reservation__user_id"),
+                order_by=[F("created_at").desc(), F("id").desc()],
+            )
+        )
+        .filter(user_rank__lte=limit)
+        .order_by("-created_at", "-id")
+    )
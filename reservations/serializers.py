@@ -3,28 +3,55 @@ from .models import Reservation, Transaction
 from vehicles.models import VehicleDetails
 from user_accounts.serializers import UserAccountSerializer
 from vehicles.serializers import VehicleDetailsSerializer, VehicleSerializer
+from utils.eager_loading import EagerLoadingMixin
 
 
-class ReservationSerializer(serializers.ModelSerializer):
+class ReservationSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     vehicle = VehicleSerializer()
     user = UserAccountSerializer()
 
     class Meta:
         model = Reservation
         fields = ["id", "user", "vehicle", "start_date", "end_date", "is_active", "is_canceled"]
+        select_related = ["user", "vehicle"]
 
     def get_vehicle_details(self, obj):
         vehicle_details = VehicleDetails.objects.get(vehicle=obj.vehicle)
         return VehicleDetailsSerializer(vehicle_details).data
 
 
-class TransactionSerializer(serializers.ModelSerializer):
+class TransactionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
     reservation = ReservationSerializer()
 
     class Meta:
         model = Transaction
         fields = ["id", "reservation", "braintree_transaction_id", "amount", "status", "created_at"]
+        select_related = ["reservation__user", "reservation__vehicle"]
 
     def get_vehicle_details(self, obj):
         vehicle_details = VehicleDetails.objects.get(vehicle=obj.reservation.vehicle)
         return VehicleDetailsSerializer(vehicle_details).data
+
+
+class ClientTransactionSerializer(EagerLoadingMixin, serializers.ModelSerializer):
+    reservation_id = serializers.IntegerField(source="reservation.id")
+    vehicle_id = serializers.IntegerField(source="reservation.vehicle_id")
+    vehicle_name = serializers.CharField(source="reservation.vehicle.name")
+    start_date = serializers.DateTimeField(source="reservation.start_date")
+    end_date = serializers.DateTimeField(source="reservation.end_date")
+
+    class Meta:
+        model = Transaction
+        fields = [
+            "id",
+            "braintree_transaction_id",
+            "amount",
+            "status",
+            "created_at",
+            "reservation_id",
+            "vehicle_id",
+            "vehicle_name",
+            "start_date",
+            "end_date",
+        ]
+        select_related = ["reservation__vehicle"]
@@ -0,0 +1,12 @@
+from django.db.models.signals import post_delete
+from .models import DeletedReservation, Reservation
+from django.dispatch import receiver
+
+
+@receiver(post_delete, sender=Reservation)
+def reservation_deleted(sender, instance, **kwargs):
+    # Unpaid holds are left out of the rollups, so releasing one changes nothing there
+    if instance.hold_expires_at is None:
+        DeletedReservation.objects.create(
+            vehicle_id=instance.vehicle_id, user_id=instance.user_id, start_date=instance.start_date
+        )
@@ -0,0 +1,656 @@
+from reservations.serializers import ReservationSerializer, TransactionSerializer
+from utils.braintree_utils import ENVIRONMENTS, client_token_pool, get_braintree_gateway, reset_braintree_gateway
+from utils.braintree_utils import get_client_token
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from .models import DeletedReservation, Reservation, Transaction, VehicleDailyRollup, VehicleStatusTransition
+from .models import WebhookEvent
+from .reports import compile_report, live_report, report_window
+from django.core.management import call_command
+from vehicles.models import Vehicle, VehicleDetails
+from user_accounts.models import UserAccount
+from rest_framework.test import APIClient
+from utils.image_derivatives import executor
+from utils.db_replica import STICKY_COOKIE
+from django.db import connections
+from braintree.util.xml_util import XmlUtil
+from braintree.util.crypto import Crypto
+from braintree.environment import Environment
+from django.utils.http import http_date
+from django.utils import timezone
+from django.conf import settings
+from datetime import datetime, timedelta
+from unittest import mock
+from decimal import Decimal
+import itertools
+import threading
+import time
+import tempfile
+import base64
+import json
+import io
+
+sequence = itertools.count(1)
+
+
+def create_user(role="CLIENT"):
+    number = next(sequence)
+    # No password: hashing one is most of the cost of a test user
+    return UserAccount.objects.create(
+        email=f"user{number}@example.com", first_name="Test", last_name=f"User {number}", role=role
+    )
+
+
+def create_vehicle(price_per_day=Decimal("50.00")):
+    number = next(sequence)
+    vehicle = Vehicle.objects.create(
+        name=f"Toyota Corolla {number}",
+        make="Toyota",
+        model="Corolla",
+        year=2022,
+        price=Decimal("15000.00"),
+        price_per_day=price_per_day,
+        price_per_week=price_per_day * 6,
+        price_per_month=price_per_day * 25,
+        picture1=f"vehicles/car{number}.jpg",
+    )
+    VehicleDetails.objects.create(vehicle=vehicle, color="White", description="Test vehicle")
+    return vehicle
+
+
+def create_reservation(user=None, vehicle=None, start_date=None, length=timedelta(days=2), amount=None, **kwargs):
+    start_date = start_date or timezone.now() + timedelta(days=1)
+    reservation = Reservation.objects.create(
+        user=user or create_user(),
+        vehicle=vehicle or create_vehicle(),
+        start_date=start_date,
+        end_date=start_date + length,
+        **kwargs,
+    )
+    if amount is not None:
+        Transaction.objects.create(
+            reservation=reservation,
+            braintree_transaction_id=f"bt-{reservation.id}",
+            amount=amount,
+            status="submitted_for_settlement",
+        )
+    return reservation
+
+
+class ListQueryCountTests(TestCase):
+    """The list endpoints must cost the same number of queries whatever the number of rows."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(role="ADMINISTRATOR"))
+
+    def count_queries(self, path, params=None):
+        with CaptureQueriesContext(connections["default"]) as queries:
+            response = self.client.get(path, params)
+        self.assertEqual(response.status_code, 200)
+        return len(queries)
+
+    def add_paid_reservations(self, count):
+        # Every row has its own user and vehicle, so a missing select_related would cost queries per row
+        for _ in range(count):
+            create_reservation(amount=Decimal("100.00"))
+
+    def assert_constant_queries(self, path, params=None):
+        self.add_paid_reservations(1)
+        baseline = self.count_queries(path, params)
+
+        self.add_paid_reservations(12)
+        self.assertEqual(self.count_queries(path, params), baseline)
+
+    def test_reservation_list(self):
+        self.assert_constant_queries("/api/reservations/list/")
+
+    def test_paginated_reservation_list(self):
+        self.assert_constant_queries("/api/reservations/list/", {"page": 1})
+
+    def test_cursor_paginated_reservation_list(self):
+        self.assert_constant_queries("/api/reservations/list/", {"pagination": "cursor"})
+
+    def test_transaction_list(self):
+        self.assert_constant_queries("/api/reservations/transactions/")
+
+    def test_paginated_transaction_list(self):
+        self.assert_constant_queries("/api/reservations/transactions/", {"page": 1})
+
+    def test_top_frequent_clients(self):
+        self.assert_constant_queries("/api/reservations/top-frequent-clients/", {"top": 20, "transactions": 5})
+
+    def test_many_serializers_load_their_relations_in_one_query(self):
+        self.add_paid_reservations(5)
+
+        with self.assertNumQueries(1):
+            self.assertEqual(len(ReservationSerializer(Reservation.objects.all(), many=True).data), 5)
+        with self.assertNumQueries(1):
+            self.assertEqual(len(TransactionSerializer(Transaction.objects.all(), many=True).data), 5)
+
+
+def local_datetime(*args):
+    return timezone.make_aware(datetime(*args))
+
+
+class RollupTests(TestCase):
+    def setUp(self):
+        self.user = create_user()
+        self.vehicle = create_vehicle()
+
+    def refresh_rollups(self):
+        call_command("refresh_rollups", stdout=io.StringIO())
+
+    def booked(self):
+        return sum(VehicleDailyRollup.objects.values_list("bookings", flat=True))
+
+    def test_unpaid_holds_are_not_bookings(self):
+        create_reservation(self.user, self.vehicle, amount=Decimal("100.00"))
+        create_reservation(
+            self.user,
+            self.vehicle,
+            start_date=timezone.now() + timedelta(days=5),
+            hold_expires_at=timezone.now() + timedelta(minutes=5),
+        )
+
+        self.refresh_rollups()
+        self.assertEqual(self.booked(), 1)
+
+    def test_deleted_reservations_are_subtracted(self):
+        kept = create_reservation(self.user, self.vehicle, amount=Decimal("100.00"))
+        deleted = create_reservation(self.user, self.vehicle, start_date=kept.start_date, amount=Decimal("50.00"))
+        self.refresh_rollups()
+        self.assertEqual(self.booked(), 2)
+
+        deleted.delete()
+        self.refresh_rollups()
+
+        rollup = VehicleDailyRollup.objects.get()
+        self.assertEqual((rollup.bookings, rollup.revenue), (1, Decimal("100.00")))
+        self.assertFalse(DeletedReservation.objects.exists())
+
+    def test_deleting_the_last_reservation_of_a_day_drops_its_bucket(self):
+        create_reservation(self.user, self.vehicle, amount=Decimal("100.00")).delete()
+        self.refresh_rollups()
+        self.assertFalse(VehicleDailyRollup.objects.exists())
+
+    def test_rollup_and_live_reports_count_the_same_reservations(self):
+        other_vehicle = create_vehicle()
+        inside = [
+            (self.vehicle, local_datetime(2030, 1, 1), Decimal("100.00"), {}),
+            (self.vehicle, local_datetime(2030, 1, 31, 23), Decimal("80.00"), {}),
+            # Starts inside and ends after the window
+            (other_vehicle, local_datetime(2030, 1, 30, 12), Decimal("60.00"), {}),
+            (other_vehicle, local_datetime(2030, 1, 10), Decimal("40.00"), {"is_canceled": True, "is_active": False}),
+        ]
+        outside = [
+            (self.vehicle, local_datetime(2029, 12, 31, 23, 59), Decimal("500.00"), {}),
+            (self.vehicle, local_datetime(2030, 2, 1), Decimal("500.00"), {}),
+            (other_vehicle, local_datetime(2030, 1, 15), None, {"hold_expires_at": timezone.now()}),
+        ]
+        for vehicle, start_date, amount, fields in inside + outside:
+            create_reservation(self.user, vehicle, start_date=start_date, amount=amount, **fields)
+
+        lower, upper = report_window("2030-01-01", "2030-01-31")
+        live = live_report(lower, upper, top=5, period="week")
+        self.refresh_rollups()
+        rollup = compile_report(lower, upper, top=5, period="week")
+
+        self.assertEqual((live["source"], rollup["source"]), ("live", "rollup"))
+        self.assertEqual(live["reservation_count"], len(inside))
+        self.assertEqual(live["total_income"], Decimal("280.00"))
+        for key in ["total_income", "reservation_count", "cancellation_rate", "average_rental_days"]:
+            self.assertEqual(rollup[key], live[key], key)
+        self.assertEqual(
+            [(row["period"], row["revenue"], row["reservation_count"]) for row in rollup["revenue_by_period"]],
+            [(row["period"], row["revenue"], row["reservation_count"]) for row in live["revenue_by_period"]],
+        )
+        self.assertEqual(
+            [(car["vehicle_name"], car["request_count"]) for car in rollup["most_requested_cars"]],
+            [(car["vehicle_name"], car["request_count"]) for car in live["most_requested_cars"]],
+        )
+
+    def test_reports_within_a_day_are_answered_live(self):
+        self.refresh_rollups()
+        lower, upper = report_window("2030-01-01T08:00:00", "2030-01-31")
+        self.assertEqual(compile_report(lower, upper)["source"], "live")
+
+
+class UpdateVehicleStatusTests(TestCase):
+    def test_updates_bump_updated_at(self):
+        vehicle = create_vehicle()
+        Vehicle.objects.filter(id=vehicle.id).update(is_available=False)
+        reservation = create_reservation(vehicle=vehicle, start_date=timezone.now() - timedelta(days=3))
+        before = timezone.now()
+
+        call_command("update_vehicle_status", stdout=io.StringIO())
+
+        reservation.refresh_from_db()
+        vehicle.refresh_from_db()
+        self.assertFalse(reservation.is_active)
+        self.assertTrue(vehicle.is_available)
+        self.assertGreaterEqual(reservation.updated_at, before)
+        self.assertGreaterEqual(vehicle.updated_at, before)
+
+
+class VehicleStatusTransitionTests(TestCase):
+    def test_transitions_bump_updated_at(self):
+        vehicle = create_vehicle()
+        reservation = create_reservation(vehicle=vehicle, start_date=timezone.now() - timedelta(days=3))
+        VehicleStatusTransition.schedule(reservation)
+        before = timezone.now()
+
+        self.assertEqual(VehicleStatusTransition.objects.apply_due(timezone.now()), 2)
+
+        reservation.refresh_from_db()
+        vehicle.refresh_from_db()
+        self.assertFalse(reservation.is_active)
+        self.assertTrue(vehicle.is_available)
+        self.assertGreaterEqual(reservation.updated_at, before)
+        self.assertGreaterEqual(vehicle.updated_at, before)
+
+
+DECLINED_NONCE = "fake-processor-declined-visa-nonce"
+
+
+class FakeBraintreeHandler(BaseHTTPRequestHandler):
+    """Answers the client token and sale calls of the Braintree SDK like the real gateway does."""
+
+    protocol_version = "HTTP/1.1"
+
+    def do_POST(self):
+        body = XmlUtil.dict_from_xml(self.rfile.read(int(self.headers["Content-Length"])).decode())
+        self.server.calls.append((self.path, self.client_address))
+        number = len(self.server.calls)
+
+        if self.path.endswith("/client_token"):
+            self.reply(201, {"client_token": {"value": f"fake-token-{number}"}})
+        elif body["transaction"]["payment_method_nonce"] == DECLINED_NONCE:
+            self.reply(422, {"api_error_response": {"message": "Do Not Honor", "errors": {"errors": []}}})
+        else:
+            amount = body["transaction"]["amount"]
+            self.reply(
+                201, {"transaction": {"id": f"fake-{number}", "status": "submitted_for_settlement", "amount": amount}}
+            )
+
+    def reply(self, status_code, payload):
+        body = XmlUtil.xml_from_dict(payload).encode()
+        self.send_response(status_code)
+        self.send_header("Content-Type", "application/xml")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@override_settings(
+    BRAINTREE_ENVIRONMENT="Fake",
+    BRAINTREE_MERCHANT_ID="merchant",
+    BRAINTREE_PUBLIC_KEY="public",
+    BRAINTREE_PRIVATE_KEY="private",
+    BRAINTREE_CLIENT_TOKEN_POOL_SIZE=0,
+)
+class BraintreeGatewayTests(TestCase):
+    """Runs the gateway, the token pool and the booking flow against a local fake Braintree server."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.server = ThreadingHTTPServer(("127.0.0.1", 0), FakeBraintreeHandler)
+        threading.Thread(target=cls.server.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.server.server_close)
+        cls.addClassCleanup(cls.server.shutdown)
+
+        port = str(cls.server.server_address[1])
+        # Plain HTTP, so no certificate is involved; only the tests know this environment
+        environment = Environment("fake", "127.0.0.1", port, "", False, None)
+        patcher = mock.patch.dict(ENVIRONMENTS, {"Fake": environment})
+        patcher.start()
+        cls.addClassCleanup(patcher.stop)
+
+    def setUp(self):
+        self.server.calls = []
+        reset_braintree_gateway()
+        self.addCleanup(reset_braintree_gateway)
+        self.client = APIClient()
+        self.user = create_user()
+        self.client.force_authenticate(self.user)
+
+    def test_gateway_is_built_once(self):
+        self.assertIs(get_braintree_gateway(), get_braintree_gateway())
+
+    def test_calls_reuse_one_keep_alive_connection(self):
+        tokens = [get_client_token() for _ in range(3)]
+
+        self.assertEqual(tokens, ["fake-token-1", "fake-token-2", "fake-token-3"])
+        self.assertEqual(len({client_address for _, client_address in self.server.calls}), 1)
+
+    @override_settings(BRAINTREE_CLIENT_TOKEN_POOL_SIZE=3)
+    def test_client_token_endpoint_is_served_from_the_pool(self):
+        client_token_pool.refill()
+        self.assertEqual(len(self.server.calls), 3)
+
+        response = self.client.get("/api/reservations/braintree/get-client-token/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["token"], "fake-token-1")
+        self.assertEqual(len(self.server.calls), 3)
+
+    @override_settings(BRAINTREE_CLIENT_TOKEN_POOL_SIZE=2, BRAINTREE_CLIENT_TOKEN_TTL_SECONDS=0)
+    def test_expired_pooled_tokens_are_not_handed_out(self):
+        client_token_pool.refill()
+        self.assertEqual(len(self.server.calls), 2)
+        self.assertIsNone(client_token_pool.pop_fresh())
+
+    def book(self, nonce):
+        start_date = timezone.localtime() + timedelta(days=2)
+        return self.client.post(
+            "/api/reservations/create/",
+            {
+                "vehicle_id": create_vehicle().id,
+                "start_date": start_date.strftime("%m/%d/%Y"),
+                "end_date": (start_date + timedelta(days=3)).strftime("%m/%d/%Y"),
+                "amount": "150.00",
+                "payment_method_nonce": nonce,
+            },
+            format="json",
+        )
+
+    def test_paid_reservation_is_confirmed(self):
+        response = self.book("fake-valid-nonce")
+
+        self.assertEqual(response.status_code, 201)
+        reservation = Reservation.objects.get()
+        self.assertIsNone(reservation.hold_expires_at)
+        self.assertEqual(
+            Transaction.objects.values_list("reservation", "braintree_transaction_id", "amount").get(),
+            (reservation.id, "fake-1", Decimal("150.00")),
+        )
+
+    def test_declined_payment_releases_the_hold(self):
+        response = self.book(DECLINED_NONCE)
+
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "Do Not Honor")
+        self.assertFalse(Reservation.objects.exists())
+
+
+def signed_webhook(kind, transaction_id, status, occurred_at):
+    """A webhook as Braintree posts it, signed with the test keys of WebhookReplayTests."""
+    notification = (
+        f'<notification><timestamp type="datetime">{occurred_at:%Y-%m-%dT%H:%M:%SZ}</timestamp><kind>{kind}</kind>'
+        f"<subject><transaction><id>{transaction_id}</id><status>{status}</status><amount>100.00</amount>"
+        "</transaction></subject></notification>"
+    )
+    payload = base64.encodebytes(notification.encode()).decode()
+    return {"bt_signature": f"public|{Crypto.sha1_hmac_hash('private', payload)}", "bt_payload": payload}
+
+
+@override_settings(BRAINTREE_MERCHANT_ID="merchant", BRAINTREE_PUBLIC_KEY="public", BRAINTREE_PRIVATE_KEY="private")
+class WebhookReplayTests(TestCase):
+    """Replays recorded webhook payloads through the endpoint and applies them with the batch processor."""
+
+    def setUp(self):
+        reset_braintree_gateway()
+        self.addCleanup(reset_braintree_gateway)
+        self.payment = create_reservation(amount=Decimal("100.00")).transaction
+        self.settled_at = timezone.now().replace(microsecond=0) - timedelta(hours=1)
+
+    def replay(self, *webhooks):
+        with tempfile.NamedTemporaryFile("w", suffix=".jsonl") as recorded:
+            recorded.writelines(json.dumps(webhook) + "\n" for webhook in webhooks)
+            recorded.flush()
+            call_command("replay_webhooks", recorded.name, "--process", stdout=io.StringIO())
+        self.payment.refresh_from_db()
+
+    def settled(self, occurred_at):
+        return signed_webhook("transaction_settled", self.payment.braintree_transaction_id, "settled", occurred_at)
+
+    def declined(self, occurred_at):
+        return signed_webhook(
+            "transaction_settlement_declined",
+            self.payment.braintree_transaction_id,
+            "settlement_declined",
+            occurred_at,
+        )
+
+    def test_replayed_settlement_is_applied(self):
+        self.replay(self.settled(self.settled_at))
+
+        self.assertEqual((self.payment.status, self.payment.status_changed_at), ("settled", self.settled_at))
+        self.assertFalse(WebhookEvent.objects.pending().exists())
+
+    def test_redelivered_webhooks_are_stored_once(self):
+        webhook = self.settled(self.settled_at)
+        self.replay(webhook, webhook)
+        self.assertEqual(WebhookEvent.objects.count(), 1)
+
+    def test_the_latest_event_of_a_batch_wins_whatever_the_arrival_order(self):
+        self.replay(self.settled(self.settled_at), self.declined(self.settled_at - timedelta(minutes=5)))
+        self.assertEqual((self.payment.status, self.payment.status_changed_at), ("settled", self.settled_at))
+
+    def test_events_older_than_the_applied_status_are_skipped(self):
+        self.replay(self.settled(self.settled_at))
+        self.replay(self.declined(self.settled_at - timedelta(minutes=5)))
+
+        self.assertEqual((self.payment.status, self.payment.status_changed_at), ("settled", self.settled_at))
+        self.assertFalse(WebhookEvent.objects.pending().exists())
+
+    def test_newer_events_replace_the_applied_status(self):
+        self.replay(self.settled(self.settled_at))
+        self.replay(self.declined(self.settled_at + timedelta(minutes=5)))
+        self.assertEqual(self.payment.status, "settlement_declined")
+
+
+def encode_cursor(values):
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode()
+
+
+class CursorPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(role="ADMINISTRATOR"))
+
+    def test_walking_the_pages_returns_every_row_once(self):
+        reservations = [create_reservation() for _ in range(25)]
+        # Three runs of identical timestamps, so pages end in the middle of ties and only the id orders them
+        base = timezone.now().replace(microsecond=123456)
+        for index, reservation in enumerate(reservations):
+            Reservation.objects.filter(id=reservation.id).update(created_at=base - timedelta(minutes=index % 3))
+        expected = [
+            reservation.id
+            for reservation in sorted(
+                Reservation.objects.all(),
+                key=lambda reservation: (reservation.created_at, reservation.id),
+                reverse=True,
+            )
+        ]
+
+        seen = []
+        pages = 0
+        url = "/api/reservations/list/?pagination=cursor"
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            seen.extend(reservation["id"] for reservation in response.data["results"])
+            url = response.data["next"]
+            pages += 1
+
+        self.assertEqual(pages, 3)
+        self.assertEqual(seen, expected)
+
+    def test_invalid_cursors_are_bad_requests(self):
+        create_reservation()
+        for cursor in [
+            "not base64!",
+            base64.urlsafe_b64encode(b"not json").decode(),
+            encode_cursor({"created_at": "2030-01-01T00:00:00+00:00"}),
+            encode_cursor(["2030-01-01T00:00:00+00:00"]),
+            encode_cursor(["yesterday", 1]),
+            encode_cursor(["2030-01-01T00:00:00+00:00", "one"]),
+            encode_cursor(["2030-01-01T00:00:00+00:00", 2**70]),
+            encode_cursor([None, None]),
+        ]:
+            with self.subTest(cursor=cursor):
+                response = self.client.get("/api/reservations/list/", {"cursor": cursor})
+                self.assertEqual(response.status_code, 400)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user(role="ADMINISTRATOR"))
+
+    def etag(self, path):
+        response = self.client.get(path)
+        self.assertEqual(response.status_code, 200)
+        return response["ETag"]
+
+    def assert_not_modified(self, path, etag):
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def assert_modified(self, path, etag):
+        self.assertEqual(self.client.get(path, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_unchanged_lists_are_not_modified(self):
+        create_reservation(amount=Decimal("100.00"))
+        for path in ["/api/reservations/list/", "/api/reservations/transactions/"]:
+            self.assert_not_modified(path, self.etag(path))
+
+    def test_only_the_etag_is_a_validator(self):
+        reservation = create_reservation()
+        create_reservation()
+        response = self.client.get("/api/reservations/list/")
+        self.assertNotIn("Last-Modified", response)
+
+        # Deleting a row leaves the newest updated_at as it was; only the ETag's row count notices
+        reservation.delete()
+        self.assert_modified("/api/reservations/list/", response["ETag"])
+        future = http_date(time.time() + 60)
+        self.assertEqual(self.client.get("/api/reservations/list/", HTTP_IF_MODIFIED_SINCE=future).status_code, 200)
+
+    def test_released_holds_change_the_reservation_etag(self):
+        create_reservation(hold_expires_at=timezone.now() - timedelta(minutes=1))
+        etag = self.etag("/api/reservations/list/")
+
+        self.assertEqual(Reservation.objects.release_expired_holds(timezone.now()), 1)
+        self.assert_modified("/api/reservations/list/", etag)
+
+    def test_vehicle_transitions_change_the_reservation_etag(self):
+        reservation = create_reservation(start_date=timezone.now() - timedelta(days=3))
+        VehicleStatusTransition.schedule(reservation)
+        etag = self.etag("/api/reservations/list/")
+
+        VehicleStatusTransition.objects.apply_due(timezone.now())
+        self.assert_modified("/api/reservations/list/", etag)
+
+    def test_settlements_change_the_transaction_etag(self):
+        payment = create_reservation(amount=Decimal("100.00")).transaction
+        etag = self.etag("/api/reservations/transactions/")
+
+        WebhookEvent.objects.create(
+            event_id="settled",
+            kind="transaction_settled",
+            braintree_transaction_id=payment.braintree_transaction_id,
+            status="settled",
+            occurred_at=timezone.now(),
+            payload="",
+        )
+        WebhookEvent.objects.process_batch()
+        self.assert_modified("/api/reservations/transactions/", etag)
+
+    def test_not_modified_lists_cost_one_query_and_no_serialization(self):
+        for _ in range(20):
+            create_reservation(amount=Decimal("100.00"))
+        path = "/api/reservations/transactions/"
+        etag = self.etag(path)
+
+        serialize = TransactionSerializer.to_representation
+        with mock.patch.object(TransactionSerializer, "to_representation", autospec=True, side_effect=serialize) as spy:
+            with self.assertNumQueries(1):
+                self.assert_not_modified(path, etag)
+            spy.assert_not_called()
+
+            self.client.get(path)
+            self.assertEqual(spy.call_count, 20)
+
+
+def capture_queries():
+    """Captures the queries sent to the primary and to the replica, in that order."""
+    return CaptureQueriesContext(connections["default"]), CaptureQueriesContext(connections["replica"])
+
+
+@override_settings(REPLICA_READS_ENABLED=True)
+class ReplicaRoutingTests(TransactionTestCase):
+    """
+    The replica alias mirrors the test database. Its connection only sees committed rows, like a real replica, hence
+    a TransactionTestCase.
+    """
+
+    databases = {"default", "replica"}
+
+    def setUp(self):
+        # Commits run the on_commit callbacks at once; the test pictures do not exist, so nothing is resized
+        resizing = mock.patch.object(executor, "submit")
+        resizing.start()
+        self.addCleanup(resizing.stop)
+
+        self.user = create_user()
+        self.reservation = create_reservation(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def list_reservations(self):
+        primary, replica = capture_queries()
+        with primary, replica:
+            response = self.client.get("/api/reservations/list/")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([reservation["id"] for reservation in response.json()], [self.reservation.id])
+        return len(primary), len(replica)
+
+    def cancel(self):
+        primary, replica = capture_queries()
+        with primary, replica:
+            response = self.client.post(f"/api/reservations/cancel/{self.reservation.id}/")
+        self.assertEqual(response.status_code, 200)
+        return response, len(primary), len(replica)
+
+    def test_list_reads_go_to_the_replica(self):
+        primary, replica = self.list_reservations()
+
+        self.assertEqual(primary, 0)
+        self.assertGreater(replica, 0)
+
+    def test_writes_go_to_the_primary_and_pin_the_writer_to_it(self):
+        response, primary, replica = self.cancel()
+
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+        self.assertEqual(response.cookies[STICKY_COOKIE]["max-age"], settings.REPLICA_STICKY_SECONDS)
+
+        primary, replica = self.list_reservations()
+        self.assertGreater(primary, 0)
+        self.assertEqual(replica, 0)
+
+    def test_pins_only_hold_for_their_user(self):
+        self.cancel()
+        other = create_user()
+        self.reservation = create_reservation(user=other)
+        self.client.force_authenticate(other)
+
+        self.assertEqual(self.list_reservations()[0], 0)
+
+    def test_tampered_pins_are_ignored(self):
+        self.client.cookies[STICKY_COOKIE] = str(self.user.pk)
+
+        self.assertEqual(self.list_reservations()[0], 0)
+
+    def test_pins_expire(self):
+        self.cancel()
+
+        later = time.time() + settings.REPLICA_STICKY_SECONDS + 1
+        with mock.patch("django.core.signing.time", **{"time.return_value": later}):
+            self.assertEqual(self.list_reservations()[0], 0)
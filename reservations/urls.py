@@ -6,6 +6,7 @@ from .views import (
     list_transactions,
     generate_report,
     get_braintree_token,
+    braintree_webhook,
     top_frequent_clients,
 )
 
@@ -16,5 +17,6 @@ urlpatterns = [
     path("transactions/", list_transactions, name="list_transactions"),
     path("report/", generate_report, name="generate_report"),
     path("braintree/get-client-token/", get_braintree_token, name="get_braintree_token"),
+    path("braintree/webhook/", braintree_webhook, name="braintree_webhook"),
     path("top-frequent-clients/", top_frequent_clients, name="top_frequent_clients"),
 ]
@@ -1,30 +1,52 @@
-from rest_framework.decorators import api_view, permission_classes
-from reservations.serializers import ReservationSerializer, TransactionSerializer
-from user_accounts.models import UserAccount
-from vehicles.serializers import VehicleDetailsSerializer
-from utils.braintree_utils import get_braintree_gateway
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.decorators import authentication_classes, permission_classes
+from adrf.decorators import api_view
+from asgiref.sync import sync_to_async
+from reservations.serializers import ReservationSerializer, TransactionSerializer, ClientTransactionSerializer
+from utils.braintree_utils import call_gateway, get_braintree_gateway, get_client_token
+from rest_framework.permissions import IsAuthenticated, AllowAny
+from braintree.exceptions.invalid_signature_error import InvalidSignatureError
 from rest_framework.response import Response
-from .models import Reservation, Transaction
-from vehicles.models import VehicleDetails
-from django.db.models import Count, Sum
+from .models import Reservation, Transaction, VehicleUnavailable, WebhookEvent
+from .reports import REPORT_PERIODS, compile_report, recent_transactions, report_window, top_clients
 from vehicles.models import Vehicle
 from rest_framework import status
 from django.utils import timezone
-from datetime import datetime
+from utils.date_parser import parse_date
+from utils.pagination import get_paginator, is_pagination_requested
+from utils.conditional_get import conditional_get, queryset_validators
+from utils.db_replica import read_from_replica
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def get_braintree_token(request):
-    gateway = get_braintree_gateway()
-    token = gateway.client_token.generate()
+async def get_braintree_token(request):
+    token = await call_gateway(get_client_token)
     return Response({"token": token}, status=status.HTTP_200_OK)
 
 
+@api_view(["POST"])
+@authentication_classes([])
+@permission_classes([AllowAny])
+def braintree_webhook(request):
+    """
+    Verifies the signature of a Braintree webhook and appends it to the inbox. Status changes are
+    applied later in batches by the process_webhook_events command.
+    """
+    signature = request.data.get("bt_signature")
+    payload = request.data.get("bt_payload")
+
+    try:
+        notification = get_braintree_gateway().webhook_notification.parse(signature, payload)
+    except InvalidSignatureError as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    WebhookEvent.objects.record(notification, payload)
+    return Response(status=status.HTTP_200_OK)
+
+
 @api_view(["POST"])
 @permission_classes([IsAuthenticated])
-def create_reservation(request):
+async def create_reservation(request):
     user = request.user
     vehicle_id = request.data.get("vehicle_id")
     start_date_str = request.data.get("start_date")
@@ -33,17 +55,8 @@ def create_reservation(request):
     payment_method_nonce = request.data.get("payment_method_nonce")
 
     try:
-        # Parse the dates in MM/DD/YYYY format
-        start_date = datetime.strptime(start_date_str, "%m/%d/%Y")
-        end_date = datetime.strptime(end_date_str, "%m/%d/%Y")
-
-        # Make start_date and end_date timezone-aware (using the current timezone)
-        start_date = timezone.make_aware(start_date, timezone.get_current_timezone())
-        end_date = timezone.make_aware(end_date, timezone.get_current_timezone())
-
-        vehicle = Vehicle.objects.get(id=vehicle_id)
-        if not vehicle.is_available:
-            return Response({"error": "Vehicle is not available."}, status=status.HTTP_400_BAD_REQUEST)
+        start_date = parse_date(start_date_str)
+        end_date = parse_date(end_date_str)
 
         if timezone.now() >= start_date:
             return Response({"error": "Start date must be in the future."}, status=status.HTTP_400_BAD_REQUEST)
@@ -51,45 +64,46 @@ def create_reservation(request):
         if start_date >= end_date:
             return Response({"error": "End date must be after the start date."}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Create the reservation
-        reservation = Reservation.objects.create(
-            user=user, vehicle=vehicle, start_date=start_date, end_date=end_date, is_active=True
-        )
+        # Phase 1: a short transaction holds the vehicle for these dates
+        reservation = await sync_to_async(Reservation.objects.place_hold)(user, vehicle_id, start_date, end_date)
+    except VehicleUnavailable as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    except Vehicle.DoesNotExist:
+        return Response({"error": "Vehicle not found."}, status=status.HTTP_404_NOT_FOUND)
+    except ValueError as e:
+        return Response({"error": f"Invalid date format: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+    except Exception as e:
+        return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
-        # Process payment through Braintree
+    try:
+        # Phase 2: process payment through Braintree outside of any database transaction
         gateway = get_braintree_gateway()
-        result = gateway.transaction.sale(
+        result = await call_gateway(
+            gateway.transaction.sale,
             {
                 "amount": str(amount),
                 "payment_method_nonce": payment_method_nonce,
                 "options": {"submit_for_settlement": True},
-            }
+            },
         )
 
-        if result.is_success:
-            # Save transaction details
-            Transaction.objects.create(
-                reservation=reservation,
-                braintree_transaction_id=result.transaction.id,
-                amount=result.transaction.amount,
-                status=result.transaction.status,
-            )
+        if not result.is_success:
+            # Release the hold if payment fails
+            await reservation.arelease_hold()
+            return Response({"error": result.message}, status=status.HTTP_400_BAD_REQUEST)
 
-            # Mark the vehicle as unavailable
-            vehicle.is_available = False
-            vehicle.save()
+        # Phase 3: confirm the hold, or give the money back if it expired in the meantime
+        if not await sync_to_async(reservation.confirm_hold)(result.transaction):
+            await call_gateway(gateway.transaction.void, result.transaction.id)
+            return Response(
+                {"error": "The reservation hold expired before the payment completed. The payment was voided."},
+                status=status.HTTP_409_CONFLICT,
+            )
 
-            return Response({"message": "Reservation and payment successful!"}, status=status.HTTP_201_CREATED)
-        else:
-            # Delete the reservation if payment fails
-            reservation.delete()
-            return Response({"error": result.message}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({"message": "Reservation and payment successful!"}, status=status.HTTP_201_CREATED)
 
-    except Vehicle.DoesNotExist:
-        return Response({"error": "Vehicle not found."}, status=status.HTTP_404_NOT_FOUND)
-    except ValueError as e:
-        return Response({"error": f"Invalid date format: {e}"}, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
+        await reservation.arelease_hold()
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
@@ -114,9 +128,7 @@ def cancel_reservation(request, reservation_id):
         return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
 
-@api_view(["GET"])
-@permission_classes([IsAuthenticated])
-def list_reservations(request):
+def reservations_for(request):
     # Optional filters
     start_date = request.query_params.get("start_date")
     end_date = request.query_params.get("end_date")
@@ -138,21 +150,39 @@ def list_reservations(request):
         elif s.lower() == "canceled":
             queryset = queryset.filter(is_canceled=True)
 
-    # Serialize and return the data
-    serializer = ReservationSerializer(queryset, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return queryset
+
+
+def reservation_validators(request):
+    return queryset_validators(reservations_for(request), "updated_at", "user__updated_at", "vehicle__updated_at")
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def list_transactions(request):
+@read_from_replica
+@conditional_get(reservation_validators)
+def list_reservations(request):
+    queryset = reservations_for(request)
+    queryset = ReservationSerializer.setup_eager_loading(queryset)
+
+    # Pagination is opt-in to keep the plain list response for existing clients
+    if not is_pagination_requested(request):
+        serializer = ReservationSerializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    paginator = get_paginator(request, ordering=("-created_at", "-id"))
+    paginated_reservations = paginator.paginate_queryset(queryset.order_by("-created_at", "-id"), request)
+
+    serializer = ReservationSerializer(paginated_reservations, many=True)
+    return paginator.get_paginated_response(serializer.data)
+
+
+def transactions_for(request):
     # Optional filters
     start_date = request.query_params.get("start_date")
     end_date = request.query_params.get("end_date")
 
     # Build the queryset
-    queryset = Transaction.objects.all()
-
     if request.user.role == "ADMINISTRATOR" or request.user.role == "MANAGER":
         queryset = Transaction.objects.all()
     else:
@@ -163,95 +193,119 @@ def list_transactions(request):
     if end_date:
         queryset = queryset.filter(reservation__end_date__lte=end_date)
 
-    # Serialize and return the data
-    serializer = TransactionSerializer(queryset, many=True)
-    return Response(serializer.data, status=status.HTTP_200_OK)
+    return queryset
+
+
+def transaction_validators(request):
+    return queryset_validators(
+        transactions_for(request),
+        "updated_at",
+        "reservation__updated_at",
+        "reservation__user__updated_at",
+        "reservation__vehicle__updated_at",
+    )
+
+
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+@read_from_replica
+@conditional_get(transaction_validators)
+def list_transactions(request):
+    queryset = transactions_for(request)
+    queryset = TransactionSerializer.setup_eager_loading(queryset)
+
+    # Pagination is opt-in to keep the plain list response for existing clients
+    if not is_pagination_requested(request):
+        serializer = TransactionSerializer(queryset, many=True)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+    paginator = get_paginator(request, ordering=("-created_at", "-id"))
+    paginated_transactions = paginator.paginate_queryset(queryset.order_by("-created_at", "-id"), request)
+
+    serializer = TransactionSerializer(paginated_transactions, many=True)
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def generate_report(request):
+@read_from_replica
+async def generate_report(request):
     # Optional filters
     start_date = request.query_params.get("start_date")
     end_date = request.query_params.get("end_date")
+    period = request.query_params.get("period", "month")
 
-    # Filter reservations by date range if provided
-    reservations = Reservation.objects.all()
-    if start_date:
-        reservations = reservations.filter(start_date__gte=start_date)
-    if end_date:
-        reservations = reservations.filter(end_date__lte=end_date)
+    try:
+        top = int(request.query_params.get("top", 3))
+    except ValueError:
+        return Response({"error": "top must be a number."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # 1. Most Requested Cars (Top 3)
-    top_cars = (
-        reservations.values("vehicle__id", "vehicle__name")
-        .annotate(request_count=Count("vehicle"))
-        .order_by("-request_count")[:3]
-    )
+    if not 1 <= top <= 100:
+        return Response({"error": "top must be between 1 and 100."}, status=status.HTTP_400_BAD_REQUEST)
 
-    # 2. Attach Vehicle Details (Mileage, Description)
-    top_cars_with_details = []
-    for car in top_cars:
-        vehicle_id = car["vehicle__id"]
-        try:
-            vehicle_details = VehicleDetails.objects.get(vehicle_id=vehicle_id)
-            vehicle_data = {
-                "vehicle_name": car["vehicle__name"],
-                "request_count": car["request_count"],
-                "vehicle_details": VehicleDetailsSerializer(vehicle_details).data,
-            }
-            top_cars_with_details.append(vehicle_data)
-        except VehicleDetails.DoesNotExist:
-            # If no vehicle details are found, append car data without it
-            vehicle_data = {
-                "vehicle_name": car["vehicle__name"],
-                "request_count": car["request_count"],
-                "vehicle_details": "No details available",
-            }
-            top_cars_with_details.append(vehicle_data)
-
-    # 3. Total Income
-    transactions = Transaction.objects.filter(reservation__in=reservations)
-    total_income = transactions.aggregate(total_income=Sum("amount"))["total_income"] or 0
-
-    # Build the report data
-    report_data = {
-        "most_requested_cars": top_cars_with_details,
-        "total_income": total_income,
-    }
+    if period not in REPORT_PERIODS:
+        return Response(
+            {"error": f"period must be one of: {', '.join(REPORT_PERIODS)}."}, status=status.HTTP_400_BAD_REQUEST
+        )
+
+    try:
+        lower, upper = report_window(start_date, end_date)
+    except ValueError as e:
+        return Response({"error": f"Invalid date format: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    report_data = await sync_to_async(compile_report)(lower, upper, top, period)
 
     return Response(report_data, status=status.HTTP_200_OK)
 
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
-def top_frequent_clients(request):
-    # Get the top 5 users with the most reservations
-    top_clients = UserAccount.objects.annotate(reservation_count=Count("reservation")).order_by("-reservation_count")[
-        :5
-    ]
-
-    clients_data = []
+@read_from_replica
+async def top_frequent_clients(request):
+    # Optional filters
+    start_date = request.query_params.get("start_date")
+    end_date = request.query_params.get("end_date")
 
-    for client in top_clients:
-        # Get all transactions for the client's reservations
-        transactions = Transaction.objects.filter(reservation__user=client)
+    try:
+        top = int(request.query_params.get("top", 5))
+        transaction_limit = int(request.query_params.get("transactions", 5))
+    except ValueError:
+        return Response({"error": "top and transactions must be numbers."}, status=status.HTTP_400_BAD_REQUEST)
+
+    if not 1 <= top <= 100 or not 0 <= transaction_limit <= 50:
+        return Response(
+            {"error": "top must be between 1 and 100 and transactions between 0 and 50."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
 
-        # Serialize the transactions
-        serialized_transactions = TransactionSerializer(transactions, many=True).data
+    try:
+        lower, upper = report_window(start_date, end_date)
+    except ValueError as e:
+        return Response({"error": f"Invalid date format: {e}"}, status=status.HTTP_400_BAD_REQUEST)
 
-        # Add the client and their transaction history to the response data
-        clients_data.append(
-            {
-                "client": {
-                    "id": client.id,
-                    "email": client.email,
-                    "first_name": client.first_name,
-                    "last_name": client.last_name,
-                    "reservation_count": client.reservation_count,
-                },
-                "transactions": serialized_transactions,
-            }
-        )
+    clients = [client async for client in await sync_to_async(top_clients)(top, lower, upper)]
+
+    # The latest transactions of every client come from one batched query
+    transactions_by_client = {client.id: [] for client in clients}
+    if transaction_limit and clients:
+        transactions = recent_transactions(list(transactions_by_client), transaction_limit, lower, upper)
+        async for transaction in ClientTransactionSerializer.setup_eager_loading(transactions):
+            transactions_by_client[transaction.reservation.user_id].append(transaction)
+
+    clients_data = [
+        {
+            "client": {
+                "id": client.id,
+                "email": client.email,
+                "first_name": client.first_name,
+                "last_name": client.last_name,
+                "reservation_count": client.reservation_count,
+                "total_spent": client.total_spent or 0,
+                "last_rental_date": client.last_rental_date,
+            },
+            "transactions": ClientTransactionSerializer(transactions_by_client[client.id], many=True).data,
+        }
+        for client in clients
+    ]
 
     return Response(clients_data)
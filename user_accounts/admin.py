@@ -1,7 +1,8 @@
-from .models import UserAccount, UserProfile
+from .models import OutgoingEmail, UserAccount, UserProfile
 from django.contrib import admin
 
 # Register your models here.
 
 admin.site.register(UserAccount)
 admin.site.register(UserProfile)
+admin.site.register(OutgoingEmail)
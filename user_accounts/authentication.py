@@ -0,0 +1,59 @@
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.core.cache import cache
+from django.conf import settings
+from .models import UserAccount
+
+# Loaded for every request; any other field is deferred and fetched from the database on first access
+SNAPSHOT_FIELDS = ["id", "role", "is_active", "is_verified", "is_staff", "is_superuser", "updated_at"]
+
+
+def snapshot_key(user_id):
+    return f"auth-user:{user_id}"
+
+
+def get_user_snapshot(user_id):
+    """The cached authentication fields of a user, or None when the user does not exist."""
+    if settings.AUTH_USER_CACHE_SECONDS <= 0:
+        return UserAccount.objects.filter(id=user_id).values(*SNAPSHOT_FIELDS).first()
+
+    key = snapshot_key(user_id)
+    snapshot = cache.get(key)
+    if snapshot is None:
+        snapshot = UserAccount.objects.filter(id=user_id).values(*SNAPSHOT_FIELDS).first()
+        if snapshot is None:
+            return None
+        cache.set(key, snapshot, settings.AUTH_USER_CACHE_SECONDS)
+    return snapshot
+
+
+def invalidate_user_snapshot(user_id):
+    transaction.on_commit(lambda: cache.delete(snapshot_key(user_id)))
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWT authentication that resolves the user from a cached snapshot instead of loading the account row on every
+    request. The user is a regular UserAccount with only the snapshot fields loaded, so role checks, foreign key
+    filters and assignments need no query, while views reading other fields still get them lazily.
+    Snapshots live for AUTH_USER_CACHE_SECONDS and are dropped whenever the account is saved; it is 0 without the
+    shared cache, which loads the snapshot on every request so no process keeps stale roles or deleted users.
+    """
+
+    def get_user(self, validated_token):
+        try:
+            user_id = validated_token[api_settings.USER_ID_CLAIM]
+        except KeyError:
+            raise InvalidToken("Token contained no recognizable user identification")
+
+        snapshot = get_user_snapshot(user_id)
+        if snapshot is None:
+            raise AuthenticationFailed("User not found", code="user_not_found")
+        if not snapshot["is_active"]:
+            raise AuthenticationFailed("User is inactive", code="user_inactive")
+
+        # from_db expects the values in field order
+        field_names = [field.attname for field in UserAccount._meta.concrete_fields if field.attname in snapshot]
+        return UserAccount.from_db(DEFAULT_DB_ALIAS, field_names, [snapshot[name] for name in field_names])
@@ -0,0 +1,32 @@
+from rest_framework_simplejwt.token_blacklist.models import OutstandingToken
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+
+class Command(BaseCommand):
+    help = "Delete expired outstanding and blacklisted refresh tokens in bounded batches"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=10000, help="Outstanding tokens deleted per transaction")
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        pruned = 0
+
+        while True:
+            # Expired tokens can no longer be refreshed, so neither row is needed to reject them
+            ids = list(
+                OutstandingToken.objects.filter(expires_at__lte=now)
+                .order_by("id")
+                .values_list("id", flat=True)[: options["batch_size"]]
+            )
+            if not ids:
+                break
+
+            # Only the ids are collected; the blacklist rows go in one cascaded DELETE ... WHERE token_id IN
+            with transaction.atomic():
+                OutstandingToken.objects.filter(id__in=ids).only("id").delete()
+            pruned += len(ids)
+
+        self.stdout.write(self.style.SUCCESS(f"Pruned {pruned} expired tokens."))
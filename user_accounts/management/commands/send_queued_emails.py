@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand
+from django.core.mail import get_connection
+from user_accounts.models import OutgoingEmail
+from utils.send_emails import build_email
+from django.conf import settings
+import time
+
+
+class Command(BaseCommand):
+    help = "Deliver the queued outbox emails over one SMTP connection, retrying failures with backoff"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=50, help="Number of emails claimed at a time")
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=settings.EMAIL_OUTBOX_RATE_PER_SECOND,
+            help="Maximum emails sent per second (0 disables the limit)",
+        )
+        parser.add_argument("--max-attempts", type=int, default=settings.EMAIL_OUTBOX_MAX_ATTEMPTS)
+
+    def handle(self, *args, **options):
+        interval = 1 / options["rate"] if options["rate"] else 0
+        connection = get_connection(fail_silently=False)
+        sent = failed = 0
+
+        try:
+            while True:
+                emails = OutgoingEmail.objects.claim(options["batch_size"])
+                if not emails:
+                    break
+
+                for email in emails:
+                    started = time.monotonic()
+                    try:
+                        # Opens the connection on first use and again after a failure closed it
+                        connection.open()
+                        build_email(email, connection).send()
+                        email.mark_sent()
+                        sent += 1
+                    except Exception as e:
+                        connection.close()
+                        email.mark_failed(e, options["max_attempts"])
+                        failed += 1
+
+                    pause = interval - (time.monotonic() - started)
+                    if pause > 0:
+                        time.sleep(pause)
+        finally:
+            connection.close()
+
+        self.stdout.write(self.style.SUCCESS(f"Sent {sent} emails, {failed} failed."))
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("user_accounts", "0003_outgoing_email"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="useraccount",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name="userprofile",
+            name="updated_at",
+            field=models.DateTimeField(auto_now=True),
+        ),
+    ]
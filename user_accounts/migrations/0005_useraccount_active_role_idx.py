@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("auth", "0012_alter_user_first_name_max_length"),
+        ("user_accounts", "0004_updated_at"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="useraccount",
+            index=models.Index(
+                condition=models.Q(("is_active", True)), fields=["role", "id"], name="user_active_role_idx"
+            ),
+        ),
+    ]
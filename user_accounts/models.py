@@ -2,8 +2,10 @@ from django.contrib.auth.models import AbstractBaseUser, BaseUserManager, Permis
 from django.utils.crypto import get_random_string
 from utils.send_emails import send_email
 from utils.image_renamer import wrapper
+from django.utils import timezone
 from django.conf import settings
-from django.db import models
+from django.db import models, transaction
+from datetime import timedelta
 
 
 class UserAccountManager(BaseUserManager):
@@ -48,6 +50,7 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     confirmation_token = models.CharField(max_length=50, blank=True, null=True)
 
     date_joined = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     is_verified = models.BooleanField(default=False)
     is_active = models.BooleanField(default=True)
@@ -60,6 +63,12 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     USERNAME_FIELD = "email"
     REQUIRED_FIELDS = ["first_name", "last_name"]
 
+    class Meta:
+        indexes = [
+            # list_users: active users by role, ordered by id
+            models.Index(fields=["role", "id"], condition=models.Q(is_active=True), name="user_active_role_idx"),
+        ]
+
     def __str__(self):
         return self.email
 
@@ -70,7 +79,7 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     def send_verification_email(self):
         user = self
         email_context = {
-            "user": user,
+            "user": {"first_name": user.first_name},
             "confirmation_url": f"{settings.FRONTEND_URL}/confirm-account?token={user.confirmation_token}",
         }
         send_email("Account Confirmation", user, email_context, "account_verification")
@@ -78,7 +87,7 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
     def send_delete_verification_email(self):
         user = self
         email_context = {
-            "user": user,
+            "user": {"first_name": user.first_name},
             "confirmation_url": f"{settings.FRONTEND_URL}/delete-account?token={user.confirmation_token}",
         }
         send_email("Account Delete Confirmation", user, email_context, "delete_confirmation")
@@ -99,6 +108,8 @@ class UserAccount(AbstractBaseUser, PermissionsMixin):
 
 
 class UserProfile(models.Model):
+    IMAGE_FIELDS = ["profile_picture", "passport", "drivers_license", "national_id"]
+
     user = models.OneToOneField(UserAccount, on_delete=models.CASCADE, related_name="account_details")
 
     birth_date = models.DateField(blank=True, null=True)
@@ -115,5 +126,80 @@ class UserProfile(models.Model):
     city = models.CharField(max_length=255, blank=True, null=True)
     address = models.TextField(blank=True, null=True)
 
+    updated_at = models.DateTimeField(auto_now=True)
+
     def __str__(self) -> str:
         return self.user.email
+
+
+class OutgoingEmailQuerySet(models.QuerySet):
+    def due(self, now):
+        return self.filter(status=OutgoingEmail.PENDING, next_attempt_at__lte=now)
+
+    def claim(self, limit, lease_seconds=300):
+        """
+        Reserves the next due emails for one worker by pushing their next attempt past the lease, so the
+        SMTP conversation happens outside of any database transaction.
+        """
+        now = timezone.now()
+        with transaction.atomic():
+            emails = list(self.due(now).select_for_update(skip_locked=True).order_by("next_attempt_at", "id")[:limit])
+            self.filter(id__in=[email.id for email in emails]).update(
+                next_attempt_at=now + timedelta(seconds=lease_seconds)
+            )
+        return emails
+
+
+class OutgoingEmail(models.Model):
+    """An email queued by send_email and delivered by the send_queued_emails worker."""
+
+    PENDING = "PENDING"
+    SENT = "SENT"
+    FAILED = "FAILED"
+    STATUSES = [(PENDING, "Pending"), (SENT, "Sent"), (FAILED, "Failed")]
+
+    # Retries back off exponentially from RETRY_BASE_SECONDS up to RETRY_MAX_SECONDS
+    RETRY_BASE_SECONDS = 60
+    RETRY_MAX_SECONDS = 60 * 60
+
+    to_email = models.EmailField(max_length=500)
+    subject = models.CharField(max_length=255)
+    template = models.CharField(max_length=255)
+    context = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default=PENDING)
+    attempts = models.PositiveIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    sent_at = models.DateTimeField(blank=True, null=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = OutgoingEmailQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at", "id"],
+                condition=models.Q(status="PENDING"),
+                name="outgoing_email_due_idx",
+            ),
+        ]
+
+    def mark_sent(self):
+        self.status = self.SENT
+        self.attempts += 1
+        self.sent_at = timezone.now()
+        self.last_error = ""
+        self.save(update_fields=["status", "attempts", "sent_at", "last_error"])
+
+    def mark_failed(self, error, max_attempts):
+        self.attempts += 1
+        self.last_error = str(error)
+        if self.attempts >= max_attempts:
+            self.status = self.FAILED
+        else:
+            delay = min(self.RETRY_BASE_SECONDS * 2 ** (self.attempts - 1), self.RETRY_MAX_SECONDS)
+            self.next_attempt_at = timezone.now() + timedelta(seconds=delay)
+        self.save(update_fields=["status", "attempts", "last_error", "next_attempt_at"])
+
+    def __str__(self):
+        return f"{self.subject} to {self.to_email} ({self.status})"
@@ -1,5 +1,8 @@
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer, TokenRefreshSerializer
+from .tokens import FilteredRefreshToken
 from rest_framework import serializers
 from .models import UserAccount, UserProfile
+from utils.image_derivatives import derivative_urls
 
 
 class UserAccountSerializer(serializers.ModelSerializer):
@@ -26,6 +29,7 @@ class UserAccountSerializer(serializers.ModelSerializer):
 
 class UserProfileSerializer(serializers.ModelSerializer):
     user = UserAccountSerializer()
+    profile_picture_derivatives = serializers.SerializerMethodField()
 
     class Meta:
         model = UserProfile
@@ -38,7 +42,26 @@ class UserProfileSerializer(serializers.ModelSerializer):
             "city",
             "address",
             "profile_picture",
+            "profile_picture_derivatives",
             "passport",
             "drivers_license",
             "national_id",
         ]
+
+    def get_profile_picture_derivatives(self, profile):
+        return derivative_urls(profile.profile_picture)
+
+
+class UserTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        # Copied into every access token refreshed from this one, so clients can read the role without a request
+        token = super().get_token(user)
+        token["role"] = user.role
+        token["is_active"] = user.is_active
+        token["is_verified"] = user.is_verified
+        return token
+
+
+class FilteredTokenRefreshSerializer(TokenRefreshSerializer):
+    token_class = FilteredRefreshToken
@@ -0,0 +1,23 @@
+from utils.image_derivatives import remember_images, schedule_changed_derivatives
+from django.db.models.signals import post_delete, post_init, post_save
+from .authentication import invalidate_user_snapshot
+from django.dispatch import receiver
+from .models import UserAccount, UserProfile
+
+
+@receiver([post_save, post_delete], sender=UserAccount)
+def account_changed(sender, instance, **kwargs):
+    # Role, activation and verification changes, including soft deletes, must reach the cached request user
+    invalidate_user_snapshot(instance.pk)
+
+
+@receiver(post_init, sender=UserProfile)
+def profile_loaded(sender, instance, **kwargs):
+    remember_images(instance, ["profile_picture"])
+
+
+@receiver(post_save, sender=UserProfile)
+def profile_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    # Only the profile picture is shown in listings; the identity documents are not resized
+    if not raw:
+        schedule_changed_derivatives(instance, ["profile_picture"], created, update_fields)
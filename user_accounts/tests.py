@@ -0,0 +1,195 @@
+from rest_framework_simplejwt.tokens import AccessToken
+from .authentication import SNAPSHOT_FIELDS, snapshot_key
+from django.test import TestCase, override_settings
+from django.core.management import call_command
+from .models import OutgoingEmail, UserAccount
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from email import message_from_bytes
+from django.utils import timezone
+import socketserver
+import threading
+import itertools
+import io
+
+sequence = itertools.count(1)
+
+
+def create_user(role="CLIENT", email=None):
+    number = next(sequence)
+    # No password: hashing one is most of the cost of a test user
+    return UserAccount.objects.create(
+        email=email or f"user{number}@example.com", first_name="Test", last_name=f"User {number}", role=role
+    )
+
+
+class AuthenticationTests(TestCase):
+    """Authenticates with real access tokens, so the request user comes from CachedJWTAuthentication."""
+
+    def setUp(self):
+        cache.clear()
+        self.manager = create_user(role="MANAGER")
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Bearer {AccessToken.for_user(self.manager)}")
+
+    def stale_snapshot(self):
+        """What another process still has cached from before the account changed."""
+        snapshot = UserAccount.objects.filter(id=self.manager.id).values(*SNAPSHOT_FIELDS).get()
+        cache.set(snapshot_key(self.manager.id), snapshot, 60)
+
+    def test_without_a_shared_cache_changes_made_elsewhere_apply_at_once(self):
+        self.stale_snapshot()
+        # Another process saving the account only drops the snapshot from its own memory
+        UserAccount.objects.filter(id=self.manager.id).update(role="CLIENT")
+        self.assertEqual(self.client.get("/api/accounts/users/").status_code, 403)
+
+        UserAccount.objects.filter(id=self.manager.id).update(is_active=False)
+        self.assertEqual(self.client.get("/api/accounts/user/").status_code, 401)
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=60)
+    def test_cached_user_needs_no_query(self):
+        create_user()
+        self.client.get("/api/accounts/users/")
+
+        # The user list and its count
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get("/api/accounts/users/").status_code, 200)
+
+    @override_settings(AUTH_USER_CACHE_SECONDS=60)
+    def test_saving_the_account_drops_the_cached_user(self):
+        self.client.get("/api/accounts/users/")
+
+        self.manager.role = "CLIENT"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.save()
+        self.assertEqual(self.client.get("/api/accounts/users/").status_code, 403)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.manager.soft_delete()
+        self.assertEqual(self.client.get("/api/accounts/user/").status_code, 401)
+
+    def test_account_is_serialized_with_every_field(self):
+        response = self.client.get("/api/accounts/user/")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["email"], self.manager.email)
+        self.assertEqual(response.data["last_name"], self.manager.last_name)
+
+
+class SMTPSinkHandler(socketserver.StreamRequestHandler):
+    """Speaks just enough SMTP to take messages from Django's SMTP backend and keep them in memory."""
+
+    def handle(self):
+        self.server.connections += 1
+        self.reply("220 sink ready")
+        recipients = []
+
+        while line := self.rfile.readline():
+            command = line.decode().strip()
+            verb = command[:4].upper()
+            if verb in ("HELO", "EHLO"):
+                self.reply("250 sink")
+            elif verb == "MAIL":
+                recipients = []
+                self.reply("250 OK")
+            elif verb == "RCPT":
+                address = command.split(":", 1)[1].strip().strip("<>")
+                if address in self.server.refused:
+                    self.reply("550 No such mailbox")
+                else:
+                    recipients.append(address)
+                    self.reply("250 OK")
+            elif verb == "DATA":
+                self.reply("354 End data with <CR><LF>.<CR><LF>")
+                message = b"".join(iter(self.rfile.readline, b".\r\n"))
+                self.server.messages.append((recipients, message_from_bytes(message)))
+                self.reply("250 OK")
+            elif verb == "QUIT":
+                self.reply("221 Bye")
+                return
+            else:
+                self.reply("250 OK")
+
+    def reply(self, line):
+        self.wfile.write(f"{line}\r\n".encode())
+
+
+class OutboxDeliveryTests(TestCase):
+    """Delivers the outbox through Django's SMTP backend to a local SMTP sink."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.sink = socketserver.ThreadingTCPServer(("127.0.0.1", 0), SMTPSinkHandler)
+        cls.sink.daemon_threads = True
+        threading.Thread(target=cls.sink.serve_forever, daemon=True).start()
+        cls.addClassCleanup(cls.sink.server_close)
+        cls.addClassCleanup(cls.sink.shutdown)
+
+        smtp_settings = override_settings(
+            EMAIL_BACKEND="django.core.mail.backends.smtp.EmailBackend",
+            EMAIL_HOST="127.0.0.1",
+            EMAIL_PORT=cls.sink.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER="",
+            EMAIL_HOST_PASSWORD="",
+        )
+        smtp_settings.enable()
+        cls.addClassCleanup(smtp_settings.disable)
+
+    def setUp(self):
+        self.sink.connections = 0
+        self.sink.messages = []
+        self.sink.refused = set()
+
+    def deliver(self, **options):
+        call_command("send_queued_emails", rate=0, stdout=io.StringIO(), **options)
+
+    def test_queueing_does_not_talk_to_smtp(self):
+        create_user().send_verification_email()
+
+        self.assertEqual(OutgoingEmail.objects.get().status, OutgoingEmail.PENDING)
+        self.assertEqual(self.sink.connections, 0)
+
+    def test_queued_emails_are_delivered_over_one_connection(self):
+        users = [create_user() for _ in range(3)]
+        for user in users:
+            user.send_verification_email()
+
+        self.deliver()
+
+        self.assertEqual(self.sink.connections, 1)
+        self.assertEqual([recipients for recipients, _ in self.sink.messages], [[user.email] for user in users])
+        message = self.sink.messages[0][1]
+        self.assertEqual(message["Subject"], "Account Confirmation")
+        self.assertEqual(
+            [part.get_content_type() for part in message.walk()], ["multipart/alternative", "text/plain", "text/html"]
+        )
+        self.assertFalse(OutgoingEmail.objects.exclude(status=OutgoingEmail.SENT).exists())
+
+    def test_refused_email_is_retried_later_without_blocking_the_others(self):
+        refused = create_user(email="missing@example.com")
+        delivered = create_user()
+        self.sink.refused.add(refused.email)
+        refused.send_verification_email()
+        delivered.send_verification_email()
+
+        self.deliver()
+
+        email = OutgoingEmail.objects.get(to_email=refused.email)
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.PENDING, 1))
+        self.assertIn("No such mailbox", email.last_error)
+        self.assertGreater(email.next_attempt_at, timezone.now())
+        self.assertEqual(OutgoingEmail.objects.get(to_email=delivered.email).status, OutgoingEmail.SENT)
+        self.assertEqual([recipients for recipients, _ in self.sink.messages], [[delivered.email]])
+
+    def test_email_fails_after_the_last_attempt(self):
+        user = create_user(email="missing@example.com")
+        self.sink.refused.add(user.email)
+        user.send_delete_verification_email()
+
+        self.deliver(max_attempts=1)
+
+        email = OutgoingEmail.objects.get()
+        self.assertEqual((email.status, email.attempts), (OutgoingEmail.FAILED, 1))
+        self.assertEqual(self.sink.messages, [])
@@ -0,0 +1,139 @@
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.utils import datetime_from_epoch
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.tokens import RefreshToken
+from utils.bloom_filter import BloomFilter
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.conf import settings
+import threading
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+# Rows re-read before the last synced id, so a blacklisting whose transaction committed late is not skipped
+SYNC_OVERLAP_ROWS = 100
+
+
+class BlacklistFilter:
+    """
+    Process-wide bloom filter of the blacklisted refresh token ids. A token missing from it is certainly not
+    blacklisted, so only possible hits are checked in the database. The filter is rebuilt from the unexpired
+    blacklist on a background thread every TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS and picks up new rows by
+    primary key every TOKEN_BLACKLIST_FILTER_SYNC_SECONDS; tokens blacklisted by this process are added at once.
+    Until the first build completes every check goes to the database.
+    """
+
+    def __init__(self):
+        self.filter = None
+        self.last_id = 0
+        self.synced_at = 0
+        self.built_at = 0
+        self.lock = threading.Lock()
+        self.sync_lock = threading.Lock()
+        self.rebuilding = False
+
+    def might_contain(self, jti):
+        now = time.monotonic()
+        if self.filter is None or now - self.built_at > settings.TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS:
+            self.rebuild_in_background()
+        if self.filter is None:
+            return True
+
+        if now - self.synced_at > settings.TOKEN_BLACKLIST_FILTER_SYNC_SECONDS:
+            self.sync()
+        return jti in self.filter
+
+    def add(self, jti):
+        with self.lock:
+            if self.filter is not None:
+                self.filter.add(jti)
+
+    def sync(self):
+        # One thread syncs at a time; the others keep answering from the filter as it is
+        if not self.sync_lock.acquire(blocking=False):
+            return
+        try:
+            rows = list(
+                BlacklistedToken.objects.filter(id__gt=self.last_id - SYNC_OVERLAP_ROWS)
+                .order_by("id")
+                .values_list("id", "token__jti")
+            )
+            with self.lock:
+                if self.filter is None:
+                    return
+                for row_id, jti in rows:
+                    self.filter.add(jti)
+                    self.last_id = max(self.last_id, row_id)
+                self.synced_at = time.monotonic()
+        finally:
+            self.sync_lock.release()
+
+    def rebuild_in_background(self):
+        with self.lock:
+            if self.rebuilding:
+                return
+            self.rebuilding = True
+        threading.Thread(target=self.rebuild, name="token-blacklist-filter", daemon=True).start()
+
+    def rebuild(self):
+        try:
+            last_id = BlacklistedToken.objects.aggregate(last_id=Max("id"))["last_id"] or 0
+            blacklisted = BlacklistedToken.objects.filter(id__lte=last_id, token__expires_at__gt=timezone.now())
+
+            bloom = BloomFilter(int(blacklisted.count() * 1.5) + 10000, settings.TOKEN_BLACKLIST_FILTER_ERROR_RATE)
+            bloom.update(blacklisted.values_list("token__jti", flat=True).iterator(chunk_size=10000))
+
+            with self.lock:
+                self.filter = bloom
+                self.last_id = last_id
+                # Rows blacklisted while building are added by the next check
+                self.synced_at = 0
+                self.built_at = time.monotonic()
+        except Exception:
+            logger.exception("Could not build the token blacklist filter")
+        finally:
+            with self.lock:
+                self.rebuilding = False
+
+
+blacklist_filter = BlacklistFilter()
+
+
+class FilteredRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check consults the bloom filter first when TOKEN_BLACKLIST_FILTER_ENABLED."""
+
+    def check_blacklist(self):
+        if settings.TOKEN_BLACKLIST_FILTER_ENABLED and not blacklist_filter.might_contain(
+            self.payload[api_settings.JTI_CLAIM]
+        ):
+            return
+        super().check_blacklist()
+
+    def blacklist(self):
+        """
+        Blacklists the token with plain inserts instead of simplejwt's two get_or_create calls. Rotated tokens are
+        never outstanding, so both rows usually go in one transaction; the unique constraints also make a second
+        concurrent rotation of the same token fail instead of issuing it another successor.
+        """
+        jti = self.payload[api_settings.JTI_CLAIM]
+        try:
+            with transaction.atomic():
+                token = OutstandingToken.objects.create(
+                    jti=jti, token=str(self), expires_at=datetime_from_epoch(self.payload["exp"])
+                )
+                blacklisted = BlacklistedToken.objects.create(token=token)
+        except IntegrityError:
+            # Tokens issued at login are outstanding already
+            try:
+                with transaction.atomic():
+                    blacklisted = BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=jti))
+            except IntegrityError:
+                raise TokenError("Token is blacklisted")
+
+        if settings.TOKEN_BLACKLIST_FILTER_ENABLED:
+            blacklist_filter.add(jti)
+        return blacklisted
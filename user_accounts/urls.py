@@ -16,4 +16,6 @@ urlpatterns = [
     path("user/delete/<int:user_id>/", views.delete_user_by_id, name="delete_user"),
     path("user/profile/", views.get_user_profile, name="get_profile"),
     path("user/profile/update/", views.update_user_profile, name="update_profile"),
+    path("user/profile/upload/", views.create_profile_upload, name="create_profile_upload"),
+    path("user/profile/attach/", views.attach_profile_image, name="attach_profile_image"),
 ]
@@ -1,8 +1,10 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework_simplejwt.tokens import RefreshToken
+from .tokens import FilteredRefreshToken
 from .serializers import UserAccountSerializer, UserProfileSerializer
-from rest_framework.pagination import PageNumberPagination
+from utils.pagination import get_paginator
+from utils.conditional_get import conditional_get, queryset_validators
+from utils.direct_uploads import InvalidUpload, create_upload, finalize_upload
 from rest_framework.response import Response
 from .models import UserProfile, UserAccount
 from rest_framework import status
@@ -14,7 +16,7 @@ from django.db import transaction
 def logout(request):
     refresh_token = request.data.get("refresh")
 
-    refresh_token = RefreshToken(refresh_token)
+    refresh_token = FilteredRefreshToken(refresh_token)
     refresh_token.blacklist()
 
     return Response(status=status.HTTP_200_OK)
@@ -54,7 +56,8 @@ def register(request):
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
 def get_user(request):
-    serializer = UserAccountSerializer(request.user)
+    # The request user only has the authentication fields loaded
+    serializer = UserAccountSerializer(UserAccount.objects.get(id=request.user.id))
     return Response(serializer.data, status=status.HTTP_200_OK)
 
 
@@ -75,7 +78,7 @@ def list_users(request):
 
     users = users.order_by("id")
 
-    paginator = PageNumberPagination()
+    paginator = get_paginator(request, ordering=("id",))
     paginated_vehicles = paginator.paginate_queryset(users, request)
 
     serializer = UserAccountSerializer(paginated_vehicles, many=True)
@@ -86,7 +89,7 @@ def list_users(request):
 @api_view(["PUT", "PATCH"])
 @permission_classes([IsAuthenticated])
 def update_user(request):
-    user = request.user
+    user = UserAccount.objects.get(id=request.user.id)
     data = request.data
 
     serializer = UserAccountSerializer(user, data=data, partial=True)
@@ -143,8 +146,13 @@ def delete_user_by_id(request, user_id: int):
     return Response(status=status.HTTP_204_NO_CONTENT)
 
 
+def profile_validators(request):
+    return queryset_validators(UserProfile.objects.filter(user=request.user), "updated_at", "user__updated_at")
+
+
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@conditional_get(profile_validators)
 def get_user_profile(request):
     profile = UserProfile.objects.get(user=request.user)
     return Response(UserProfileSerializer(profile).data, status=status.HTTP_200_OK)
@@ -161,3 +169,37 @@ def update_user_profile(request):
     serializer.save()
 
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_profile_upload(request):
+    try:
+        upload = create_upload(request.user, request.data.get("content_type"), request.data.get("size"))
+    except InvalidUpload as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(upload, status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def attach_profile_image(request):
+    profile = UserProfile.objects.get(user=request.user)
+
+    field = request.data.get("field")
+    if field not in UserProfile.IMAGE_FIELDS:
+        return Response(
+            {"error": f"Invalid image field, expected one of: {', '.join(UserProfile.IMAGE_FIELDS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        name = finalize_upload(request.user, request.data.get("token"))
+    except InvalidUpload as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    setattr(profile, field, name)
+    profile.save(update_fields=[field, "updated_at"])
+
+    return Response(UserProfileSerializer(profile).data, status=status.HTTP_200_OK)
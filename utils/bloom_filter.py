@@ -0,0 +1,33 @@
+import hashlib
+import math
+
+
+class BloomFilter:
+    """
+    Fixed-size set of strings answering membership with no false negatives and about `error_rate` false
+    positives once `capacity` items were added. Items cannot be removed; build a new filter instead.
+    """
+
+    def __init__(self, capacity, error_rate=0.001):
+        capacity = max(capacity, 1)
+        self.size = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def positions(self, item):
+        # Double hashing: k positions from the two halves of a single 128-bit digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        first = int.from_bytes(digest[:8], "little")
+        second = int.from_bytes(digest[8:], "little") | 1
+        return [(first + i * second) % self.size for i in range(self.hashes)]
+
+    def add(self, item):
+        for position in self.positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+
+    def update(self, items):
+        for item in items:
+            self.add(item)
+
+    def __contains__(self, item):
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self.positions(item))
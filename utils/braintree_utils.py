@@ -1,17 +1,150 @@
+import logging
+import threading
+import time
+from collections import deque
+
 import braintree
+import requests
+from asgiref.sync import sync_to_async
+from braintree.util.http import Http
 from django.conf import settings
 
+ENVIRONMENTS = {
+    "Sandbox": braintree.Environment.Sandbox,
+}
 
-def get_braintree_gateway():
-    return braintree.BraintreeGateway(
-        braintree.Configuration(
-            (
-                braintree.Environment.Sandbox
-                if settings.BRAINTREE_ENVIRONMENT == "Sandbox"
-                else braintree.Environment.Production
-            ),
-            merchant_id=settings.BRAINTREE_MERCHANT_ID,
-            public_key=settings.BRAINTREE_PUBLIC_KEY,
-            private_key=settings.BRAINTREE_PRIVATE_KEY,
+logger = logging.getLogger(__name__)
+
+_gateway = None
+_gateway_lock = threading.Lock()
+
+
+class KeepAliveHttp(Http):
+    """
+    Braintree HTTP strategy that reuses one requests session per thread, so consecutive API calls
+    share pooled keep-alive connections instead of opening a new TLS connection every time.
+    """
+
+    _sessions = threading.local()
+
+    @classmethod
+    def session(cls):
+        session = getattr(cls._sessions, "session", None)
+        if session is None:
+            session = requests.Session()
+            session.proxies.update(requests.utils.getproxies())
+            cls._sessions.session = session
+        return session
+
+    def http_do(self, http_verb, path, headers, request_body):
+        data, files = request_body, None
+        if type(request_body) is tuple:
+            data, files = request_body
+
+        url = path if path.startswith("http") else self.config.base_url() + path
+        response = self.session().request(
+            http_verb,
+            url,
+            headers=headers,
+            data=data,
+            files=files,
+            verify=self.environment.ssl_certificate,
+            timeout=self.config.timeout,
         )
-    )
+        return [response.status_code, response.text]
+
+
+def get_braintree_gateway():
+    """Returns the process-wide Braintree gateway, building it on first use."""
+    global _gateway
+
+    if _gateway is None:
+        with _gateway_lock:
+            if _gateway is None:
+                _gateway = braintree.BraintreeGateway(
+                    braintree.Configuration(
+                        ENVIRONMENTS.get(settings.BRAINTREE_ENVIRONMENT, braintree.Environment.Production),
+                        merchant_id=settings.BRAINTREE_MERCHANT_ID,
+                        public_key=settings.BRAINTREE_PUBLIC_KEY,
+                        private_key=settings.BRAINTREE_PRIVATE_KEY,
+                        timeout=settings.BRAINTREE_TIMEOUT_SECONDS,
+                        http_strategy=KeepAliveHttp,
+                    )
+                )
+    return _gateway
+
+
+def reset_braintree_gateway():
+    """Drops the cached gateway and token pool, e.g. after the Braintree settings changed."""
+    global _gateway
+
+    with _gateway_lock:
+        _gateway = None
+    client_token_pool.clear()
+
+
+class ClientTokenPool:
+    """
+    Keeps a few pre-generated client tokens so the checkout page does not wait on a Braintree round
+    trip. Tokens are handed out once and dropped after BRAINTREE_CLIENT_TOKEN_TTL_SECONDS; the pool is
+    refilled on a background thread whenever it runs low. A pool size of 0 disables it.
+    """
+
+    def __init__(self):
+        self.tokens = deque()
+        self.lock = threading.Lock()
+        self.refilling = False
+
+    def get(self):
+        token = self.pop_fresh()
+        self.refill_in_background()
+        return token or get_braintree_gateway().client_token.generate()
+
+    def pop_fresh(self):
+        oldest_allowed = time.monotonic() - settings.BRAINTREE_CLIENT_TOKEN_TTL_SECONDS
+        with self.lock:
+            while self.tokens:
+                token, created_at = self.tokens.popleft()
+                if created_at >= oldest_allowed:
+                    return token
+        return None
+
+    def refill_in_background(self):
+        with self.lock:
+            if self.refilling or len(self.tokens) > settings.BRAINTREE_CLIENT_TOKEN_POOL_SIZE // 2:
+                return
+            self.refilling = True
+        threading.Thread(target=self.refill, name="braintree-token-pool", daemon=True).start()
+
+    def refill(self):
+        try:
+            while len(self.tokens) < settings.BRAINTREE_CLIENT_TOKEN_POOL_SIZE:
+                token = get_braintree_gateway().client_token.generate()
+                with self.lock:
+                    self.tokens.append((token, time.monotonic()))
+        except Exception:
+            logger.exception("Could not refill the Braintree client token pool")
+        finally:
+            with self.lock:
+                self.refilling = False
+
+    def clear(self):
+        with self.lock:
+            self.tokens.clear()
+
+
+client_token_pool = ClientTokenPool()
+
+
+def get_client_token():
+    if settings.BRAINTREE_CLIENT_TOKEN_POOL_SIZE <= 0:
+        return get_braintree_gateway().client_token.generate()
+    return client_token_pool.get()
+
+
+async def call_gateway(method, *args, **kwargs):
+    """
+    Runs a blocking Braintree SDK call on a worker thread, so an async view keeps serving other
+    requests while it waits on the gateway. The SDK has no async transport of its own.
+    """
+    return await sync_to_async(method, thread_sensitive=False)(*args, **kwargs)
@@ -0,0 +1,8 @@
+from django.utils import timezone
+from datetime import datetime
+
+
+def parse_date(value: str):
+    # Dates are exchanged in MM/DD/YYYY format and interpreted in the current timezone
+    date = datetime.strptime(value, "%m/%d/%Y")
+    return timezone.make_aware(date, timezone.get_current_timezone())
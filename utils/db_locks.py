@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from django.db import connections
+import zlib
+
+
+@contextmanager
+def advisory_lock(name: str, using: str = "default"):
+    """
+    Non-blocking, session level PostgreSQL advisory lock identified by `name`. Yields whether the lock
+    was acquired. Other backends have no cross-process advisory locks, so the lock is always granted.
+    """
+    connection = connections[using]
+    if connection.vendor != "postgresql":
+        yield True
+        return
+
+    key = zlib.crc32(name.encode())
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s)", [key])
+        acquired = cursor.fetchone()[0]
+
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s)", [key])
@@ -0,0 +1,103 @@
+from django.utils.decorators import sync_and_async_middleware
+from asgiref.sync import iscoroutinefunction
+from contextvars import ContextVar
+from django.conf import settings
+from functools import wraps
+
+REPLICA_ALIAS = "replica"
+
+# Signed cookie holding the id of a user who just wrote, so whichever process serves their next request sees it
+STICKY_COOKIE = "replica_sticky"
+STICKY_SALT = "utils.db_replica.sticky"
+
+# Set while a view marked with `read_from_replica` runs; asgiref copies it into sync_to_async threads
+replica_reads = ContextVar("replica_reads", default=False)
+
+
+def replica_configured():
+    return settings.REPLICA_READS_ENABLED
+
+
+def reads_from_replica(request):
+    # Users who just wrote keep reading from the primary until the replica has caught up with them
+    if not replica_configured():
+        return False
+    user = request.user
+    if not user.is_authenticated:
+        return True
+    sticky = request.get_signed_cookie(
+        STICKY_COOKIE, default=None, salt=STICKY_SALT, max_age=settings.REPLICA_STICKY_SECONDS
+    )
+    return sticky != str(user.pk)
+
+
+def read_from_replica(view):
+    """
+    Routes the reads of a read-only function view to the replica database when REPLICA_DATABASE_URL is set,
+    except for users who wrote within the last REPLICA_STICKY_SECONDS. Writes always go to the primary.
+    """
+    if iscoroutinefunction(view):
+
+        @wraps(view)
+        async def async_wrapper(request, *args, **kwargs):
+            token = replica_reads.set(reads_from_replica(request))
+            try:
+                return await view(request, *args, **kwargs)
+            finally:
+                replica_reads.reset(token)
+
+        return async_wrapper
+
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        token = replica_reads.set(reads_from_replica(request))
+        try:
+            return view(request, *args, **kwargs)
+        finally:
+            replica_reads.reset(token)
+
+    return wrapper
+
+
+def stick_to_primary(request, response):
+    user = getattr(request, "user", None)
+    if (
+        replica_configured()
+        and request.method not in ("GET", "HEAD", "OPTIONS")
+        and response.status_code < 400
+        and user is not None
+        and user.is_authenticated
+    ):
+        response.set_signed_cookie(
+            STICKY_COOKIE,
+            str(user.pk),
+            salt=STICKY_SALT,
+            max_age=settings.REPLICA_STICKY_SECONDS,
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite=settings.SESSION_COOKIE_SAMESITE,
+        )
+
+
+@sync_and_async_middleware
+def replica_stickiness_middleware(get_response):
+    """
+    Pins a user's replica reads to the primary for REPLICA_STICKY_SECONDS after each successful write request,
+    so they read their own writes. DRF sets the authenticated user back on the Django request. The pin is a signed
+    cookie rather than a cache entry, so it holds on every node and process without a shared cache.
+    """
+    if iscoroutinefunction(get_response):
+
+        async def async_middleware(request):
+            response = await get_response(request)
+            stick_to_primary(request, response)
+            return response
+
+        return async_middleware
+
+    def middleware(request):
+        response = get_response(request)
+        stick_to_primary(request, response)
+        return response
+
+    return middleware
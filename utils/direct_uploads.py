@@ -0,0 +1,130 @@
+from django.core.files.storage import default_storage
+from botocore.exceptions import ClientError
+from utils.image_renamer import wrapper
+from django.conf import settings
+from django.core import signing
+from PIL import Image
+import io
+
+SIGNING_SALT = "utils.direct_uploads"
+
+# Accepted uploads and the Pillow format each must actually decode as
+CONTENT_TYPES = {
+    "image/jpeg": ("jpg", "JPEG"),
+    "image/png": ("png", "PNG"),
+}
+
+# Enough of the file for Pillow to read the format and dimensions without downloading the whole image
+HEADER_BYTES = 64 * 1024
+
+# How long after the upload URL expires the client may still finalize the upload
+FINALIZE_GRACE_SECONDS = 3600
+
+
+class InvalidUpload(Exception):
+    pass
+
+
+def object_key(storage, name):
+    return storage._normalize_name(name)
+
+
+def s3_client(storage):
+    # Only the S3 storage can hand out presigned URLs; the filesystem storage used in tests cannot
+    if not hasattr(storage, "bucket_name"):
+        raise InvalidUpload("Direct uploads are not supported by the configured storage.")
+    return storage.connection.meta.client
+
+
+def create_upload(user, content_type, size, storage=default_storage):
+    """
+    Reserves a storage name for an image the client uploads straight to the bucket and returns the presigned
+    PUT URL, the headers the client must send with it and a signed token to finalize the upload with.
+    The content type and exact size are part of the signature, so the bucket rejects any other file.
+    """
+    if content_type not in CONTENT_TYPES:
+        raise InvalidUpload(f"Unsupported content type, expected one of: {', '.join(CONTENT_TYPES)}.")
+    try:
+        size = int(size)
+    except (TypeError, ValueError):
+        raise InvalidUpload("The file size must be given in bytes.")
+    if not 0 < size <= settings.DIRECT_UPLOAD_MAX_BYTES:
+        raise InvalidUpload(f"The file must be between 1 and {settings.DIRECT_UPLOAD_MAX_BYTES} bytes.")
+
+    client = s3_client(storage)
+    extension, _ = CONTENT_TYPES[content_type]
+    name = wrapper(None, f"upload.{extension}")
+
+    params = {
+        **storage.get_object_parameters(name),
+        "Bucket": storage.bucket_name,
+        "Key": object_key(storage, name),
+        "ContentType": content_type,
+        "ContentLength": size,
+    }
+    headers = {"Content-Type": content_type, "Content-Length": str(size)}
+    if storage.default_acl:
+        params["ACL"] = storage.default_acl
+        headers["x-amz-acl"] = storage.default_acl
+    if "CacheControl" in params:
+        headers["Cache-Control"] = params["CacheControl"]
+
+    url = client.generate_presigned_url(
+        "put_object", Params=params, ExpiresIn=settings.DIRECT_UPLOAD_EXPIRES_SECONDS, HttpMethod="PUT"
+    )
+    token = signing.dumps({"name": name, "user": user.pk, "type": content_type, "size": size}, salt=SIGNING_SALT)
+
+    return {
+        "url": url,
+        "method": "PUT",
+        "headers": headers,
+        "token": token,
+        "expires_in": settings.DIRECT_UPLOAD_EXPIRES_SECONDS,
+    }
+
+
+def finalize_upload(user, token, storage=default_storage):
+    """
+    Checks that the upload behind the token was made by the user and is the declared image, and returns its
+    storage name, ready to be assigned to an ImageField. Objects that fail the checks are deleted.
+    """
+    try:
+        upload = signing.loads(
+            token or "", salt=SIGNING_SALT, max_age=settings.DIRECT_UPLOAD_EXPIRES_SECONDS + FINALIZE_GRACE_SECONDS
+        )
+    except signing.BadSignature:
+        raise InvalidUpload("The upload token is invalid or has expired.")
+
+    if upload["user"] != user.pk:
+        raise InvalidUpload("The upload token is invalid or has expired.")
+
+    client = s3_client(storage)
+    location = {"Bucket": storage.bucket_name, "Key": object_key(storage, upload["name"])}
+
+    try:
+        head = client.head_object(**location)
+    except ClientError:
+        raise InvalidUpload("The file has not been uploaded yet.")
+
+    try:
+        if head["ContentLength"] != upload["size"] or head["ContentType"] != upload["type"]:
+            raise InvalidUpload("The uploaded file does not match the declared size and content type.")
+
+        header = client.get_object(**location, Range=f"bytes=0-{HEADER_BYTES - 1}")["Body"].read()
+        try:
+            image = Image.open(io.BytesIO(header))
+        except Exception:
+            raise InvalidUpload("The uploaded file is not a valid image.")
+
+        _, image_format = CONTENT_TYPES[upload["type"]]
+        if image.format != image_format:
+            raise InvalidUpload("The uploaded file does not match the declared content type.")
+        # The derivatives are decoded in full later on, so refuse decompression bombs now
+        width, height = image.size
+        if Image.MAX_IMAGE_PIXELS and width * height > Image.MAX_IMAGE_PIXELS:
+            raise InvalidUpload("The uploaded image is too large.")
+    except InvalidUpload:
+        client.delete_object(**location)
+        raise
+
+    return upload["name"]
@@ -0,0 +1,30 @@
+from django.db.models import QuerySet
+
+
+class EagerLoadingMixin:
+    """
+    Lets a serializer declare the relations it traverses through `Meta.select_related` and
+    `Meta.prefetch_related`. They are applied automatically when the serializer is used with
+    many=True on a queryset; paginated views call `setup_eager_loading` before slicing.
+    """
+
+    @classmethod
+    def setup_eager_loading(cls, queryset):
+        select_related = getattr(cls.Meta, "select_related", [])
+        prefetch_related = getattr(cls.Meta, "prefetch_related", [])
+
+        if select_related:
+            queryset = queryset.select_related(*select_related)
+        if prefetch_related:
+            queryset = queryset.prefetch_related(*prefetch_related)
+
+        return queryset
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        if args and isinstance(args[0], QuerySet):
+            args = (cls.setup_eager_loading(args[0]), *args[1:])
+        elif isinstance(kwargs.get("instance"), QuerySet):
+            kwargs["instance"] = cls.setup_eager_loading(kwargs["instance"])
+
+        return super().many_init(*args, **kwargs)
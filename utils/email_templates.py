@@ -0,0 +1,23 @@
+from django.template import engines
+from functools import lru_cache
+
+EMAIL_FORMATS = ("txt", "html")
+
+
+@lru_cache(maxsize=None)
+def get_email_templates(name: str):
+    """Loads and compiles the text and HTML variants of an email template once per process."""
+    engine = engines["django"]
+    return tuple(engine.get_template(f"{name}.{extension}") for extension in EMAIL_FORMATS)
+
+
+def render_email(name: str, context: dict):
+    """Returns the (text, html) bodies of an email."""
+    text_template, html_template = get_email_templates(name)
+    return text_template.render(context), html_template.render(context)
+
+
+def render_many(name: str, contexts):
+    """Renders the same email for many contexts, e.g. a batch send, reusing the compiled templates."""
+    text_template, html_template = get_email_templates(name)
+    return [(text_template.render(context), html_template.render(context)) for context in contexts]
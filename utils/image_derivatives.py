@@ -0,0 +1,130 @@
+from concurrent.futures import ThreadPoolExecutor
+from django.core.files.base import ContentFile
+from django.conf import settings
+from django.db import transaction
+from PIL import Image, ImageOps
+import logging
+import io
+
+logger = logging.getLogger(__name__)
+
+# Bounding boxes of the resized copies; images are never upscaled
+SIZES = {
+    "thumb": (160, 160),
+    "card": (480, 320),
+    "full": (1600, 1200),
+}
+
+FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+
+executor = ThreadPoolExecutor(max_workers=settings.IMAGE_DERIVATIVE_WORKERS, thread_name_prefix="image-derivatives")
+
+
+def derivative_name(name, size, extension):
+    """profile_pictures/abc.jpg -> profile_pictures/abc.thumb.webp, stored next to the original."""
+    return f"{name.rsplit('.', 1)[0]}.{size}.{extension}"
+
+
+def derivative_urls(field_file):
+    """URLs of every derivative of an image field, or None when the field is empty."""
+    if not field_file:
+        return None
+    return {
+        size: {
+            extension: field_file.storage.url(derivative_name(field_file.name, size, extension))
+            for extension in FORMATS
+        }
+        for size in SIZES
+    }
+
+
+def generate_derivatives(storage, name, force=False):
+    """
+    Writes the resized WebP and JPEG copies of one stored image. The EXIF orientation is applied to the pixels
+    and the metadata itself is dropped, so no camera or location data reaches the derivatives.
+    Returns the number of files written.
+    """
+    if not force and storage.exists(derivative_name(name, "thumb", "webp")):
+        return 0
+
+    with storage.open(name, "rb") as original:
+        image = ImageOps.exif_transpose(Image.open(original))
+        image = image.convert("RGB")
+
+    written = 0
+    for size, bounds in SIZES.items():
+        resized = image.copy()
+        resized.thumbnail(bounds, Image.Resampling.LANCZOS)
+
+        for extension, (image_format, options) in FORMATS.items():
+            buffer = io.BytesIO()
+            resized.save(buffer, image_format, **options)
+
+            path = derivative_name(name, size, extension)
+            # Keep the predictable name, storages would otherwise pick a new one next to the stale file
+            if storage.exists(path):
+                storage.delete(path)
+            storage.save(path, ContentFile(buffer.getvalue()))
+            written += 1
+
+    return written
+
+
+def generate_all(storage, names, force=False):
+    written = 0
+    for name in names:
+        try:
+            written += generate_derivatives(storage, name, force)
+        except Exception:
+            logger.exception("Could not generate the derivatives of %s", name)
+    return written
+
+
+def schedule_derivatives(instance, field_names):
+    """
+    Generates the derivatives of the instance's image fields on a background thread once the transaction
+    commits, so uploads do not wait on resizing. Images that already have derivatives are skipped.
+    """
+    files = [getattr(instance, field_name) for field_name in field_names]
+    files = [field_file for field_file in files if field_file]
+    if not files:
+        return
+
+    storage = files[0].storage
+    names = [field_file.name for field_file in files]
+    transaction.on_commit(lambda: executor.submit(generate_all, storage, names))
+
+
+def image_names(instance, field_names):
+    """Stored names of the loaded image fields. Deferred fields are left out rather than loaded."""
+    names = {}
+    for field_name in field_names:
+        if field_name in instance.__dict__:
+            value = instance.__dict__[field_name]
+            names[field_name] = getattr(value, "name", value) or ""
+    return names
+
+
+def remember_images(instance, field_names):
+    """Records the stored image names from a post_init receiver, for schedule_changed_derivatives to compare."""
+    instance._saved_image_names = image_names(instance, field_names)
+
+
+def schedule_changed_derivatives(instance, field_names, created=False, update_fields=None):
+    """
+    Schedules the derivatives of the image fields a post_save wrote a new file to, so saves that leave the
+    images alone, e.g. availability flips, cost no storage round trip and no background work.
+    """
+    saved = {} if created else getattr(instance, "_saved_image_names", {})
+    written = {
+        field_name: name
+        for field_name, name in image_names(instance, field_names).items()
+        if update_fields is None or field_name in update_fields
+    }
+
+    changed = [field_name for field_name, name in written.items() if name != saved.get(field_name, "")]
+    instance._saved_image_names = {**saved, **written}
+    schedule_derivatives(instance, changed)
@@ -0,0 +1,177 @@
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from django.core.paginator import Paginator, EmptyPage, PageNotAnInteger
+from rest_framework.utils.urls import replace_query_param
+from rest_framework.exceptions import ValidationError
+from rest_framework.settings import api_settings
+from rest_framework.response import Response
+from django.db.models import Count, Q, Window
+from django.utils.functional import cached_property
+from django.db import connections
+import base64
+import json
+
+# Below this many estimated rows an exact COUNT(*) is cheap and planner estimates are the least reliable
+APPROXIMATE_COUNT_THRESHOLD = 10_000
+
+
+def approximate_count(queryset):
+    """
+    Row count estimate taken from the PostgreSQL planner (EXPLAIN) instead of running COUNT(*).
+    Other backends, and small results where the estimate is unreliable, fall back to an exact count.
+    """
+    connection = connections[queryset.db]
+    if connection.vendor != "postgresql":
+        return queryset.count()
+
+    sql, params = queryset.order_by().query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+        plan = cursor.fetchone()[0]
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+
+    estimate = int(plan[0]["Plan"]["Plan Rows"])
+    if estimate < APPROXIMATE_COUNT_THRESHOLD:
+        return queryset.count()
+    return estimate
+
+
+class WindowCountPaginator(Paginator):
+    """
+    Paginator that fetches a page and the total row count in a single query by annotating
+    every row with COUNT(*) OVER (), instead of running a separate COUNT(*) first.
+    """
+
+    def page(self, number):
+        try:
+            number = int(number)
+        except (TypeError, ValueError):
+            raise PageNotAnInteger("That page number is not an integer")
+        if number < 1:
+            raise EmptyPage("That page number is less than 1")
+
+        bottom = (number - 1) * self.per_page
+        top = bottom + self.per_page
+        rows = list(self.object_list.annotate(window_count=Window(Count("pk")))[bottom:top])
+
+        if not rows and number > 1:
+            raise EmptyPage("That page contains no results")
+
+        self.count = rows[0].window_count if rows else 0
+        return self._get_page(rows, number, self)
+
+
+class WindowCountPagination(PageNumberPagination):
+    django_paginator_class = WindowCountPaginator
+
+
+class ApproximateCountPaginator(Paginator):
+    @cached_property
+    def count(self):
+        return approximate_count(self.object_list)
+
+
+class ApproximateCountPagination(PageNumberPagination):
+    django_paginator_class = ApproximateCountPaginator
+
+
+class KeysetPagination(BasePagination):
+    """
+    Cursor pagination that seeks past the last row of the previous page using the given ordering,
+    e.g. ("-created_at", "-id"), so deep pages cost the same as the first one. The last ordering
+    field must be unique and every field needs a matching index.
+    """
+
+    page_size = api_settings.PAGE_SIZE
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering=("id",), with_count=False):
+        self.ordering = ordering
+        self.with_count = with_count
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.count = approximate_count(queryset) if self.with_count else None
+
+        queryset = queryset.order_by(*self.ordering)
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(self.get_seek_filter(self.decode_cursor(encoded, queryset.model)))
+
+        rows = list(queryset[: self.page_size + 1])
+        self.has_next = len(rows) > self.page_size
+        self.rows = rows[: self.page_size]
+        return self.rows
+
+    def get_seek_filter(self, values):
+        # (a, b) after (x, y) means a > x OR (a = x AND b > y); the bound on the leading column
+        # keeps the scan on the index range even where the OR expansion would not.
+        fields = [field.lstrip("-") for field in self.ordering]
+        lookups = ["lt" if field.startswith("-") else "gt" for field in self.ordering]
+
+        seek = Q()
+        for i, field in enumerate(fields):
+            clause = Q(**{f"{field}__{lookups[i]}": values[i]})
+            for previous_field, previous_value in zip(fields[:i], values[:i]):
+                clause &= Q(**{previous_field: previous_value})
+            seek |= clause
+
+        if len(fields) > 1:
+            bound = "lte" if lookups[0] == "lt" else "gte"
+            seek = Q(**{f"{fields[0]}__{bound}": values[0]}) & seek
+        return seek
+
+    def decode_cursor(self, encoded, model):
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode("ascii")))
+            if len(values) != len(self.ordering):
+                raise ValueError
+            decoded = []
+            for field, value in zip(self.ordering, values):
+                model_field = model._meta.get_field(field.lstrip("-"))
+                value = model_field.to_python(value)
+                if value is None:
+                    raise ValueError("Cursor values cannot be null")
+                # Such as the database's integer range, which would otherwise fail the query
+                model_field.run_validators(value)
+                decoded.append(value)
+            return decoded
+        except Exception:
+            # Cursors come from the client, so a bad one is a bad request rather than a missing page
+            raise ValidationError({self.cursor_query_param: [self.invalid_cursor_message]})
+
+    def encode_cursor(self, row):
+        values = [getattr(row, field.lstrip("-")) for field in self.ordering]
+        values = [value.isoformat() if hasattr(value, "isoformat") else value for value in values]
+        return base64.urlsafe_b64encode(json.dumps(values).encode("ascii")).decode("ascii")
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, self.encode_cursor(self.rows[-1]))
+
+    def get_paginated_response(self, data):
+        response = {"next": self.get_next_link(), "results": data}
+        if self.with_count:
+            response = {"count": self.count, **response}
+        return Response(response)
+
+
+def is_pagination_requested(request):
+    return any(param in request.query_params for param in ["page", "pagination", "cursor"])
+
+
+def get_paginator(request, ordering=("id",)):
+    """
+    Paginator selected by the request: ?pagination=cursor switches to keyset pagination over `ordering`
+    and ?count=approximate replaces COUNT(*) with the planner estimate. Page numbers remain the default.
+    """
+    approximate = request.query_params.get("count") == "approximate"
+
+    if request.query_params.get("pagination") == "cursor" or "cursor" in request.query_params:
+        return KeysetPagination(ordering, with_count=approximate)
+    if approximate:
+        return ApproximateCountPagination()
+    return PageNumberPagination()
@@ -0,0 +1,67 @@
+from rest_framework.utils.encoders import JSONEncoder
+from utils.conditional_get import conditional_response, make_etag
+from rest_framework.response import Response
+from rest_framework import status
+from django.core.cache import cache
+from functools import wraps
+import hashlib
+import json
+
+KEY_PREFIX = "response-cache"
+
+
+def version_key(namespace):
+    return f"{KEY_PREFIX}:{namespace}:version"
+
+
+def get_version(namespace):
+    return cache.get_or_set(version_key(namespace), 1, timeout=None)
+
+
+def bump_version(namespace):
+    """Invalidates every response cached under the namespace by moving it to a new key version."""
+    try:
+        cache.incr(version_key(namespace))
+    except ValueError:
+        # The version was evicted; any cached entries were keyed on the old one and can never be hit again
+        cache.set(version_key(namespace), 1, timeout=None)
+
+
+def cache_response(timeout, namespaces):
+    """
+    Caches successful GET responses of a function view under versioned keys and answers them with an ETag,
+    returning 304 when the client already holds the current representation.
+
+    `namespaces(request, **kwargs)` returns the namespaces the response depends on, or None to skip the cache;
+    bumping any of them with `bump_version` invalidates it. The key also covers the full URL, so every page
+    and filter is cached apart.
+    """
+
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, *args, **kwargs):
+            dependencies = namespaces(request, **kwargs) if request.method == "GET" else None
+            if dependencies is None:
+                return view(request, *args, **kwargs)
+
+            versions = ":".join(f"{namespace}.{get_version(namespace)}" for namespace in dependencies)
+            url = hashlib.sha256(request.build_absolute_uri().encode()).hexdigest()
+            key = f"{KEY_PREFIX}:{view.__name__}:{versions}:{url}"
+
+            cached = cache.get(key)
+            if cached is None:
+                response = view(request, *args, **kwargs)
+                if response.status_code != status.HTTP_200_OK:
+                    return response
+
+                # The data is cached as the serializer built it, so the fields keep their declared order
+                cached = {"etag": make_etag(json.dumps(response.data, cls=JSONEncoder)), "data": response.data}
+                cache.set(key, cached, timeout)
+
+            return conditional_response(
+                request, cached["etag"], lambda: Response(cached["data"], status=status.HTTP_200_OK)
+            )
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,115 @@
+from utils.db_locks import advisory_lock
+from django.db import connection
+from django.utils import timezone
+import threading
+import logging
+import random
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class Job:
+    def __init__(self, name, func, interval, jitter=0, next_due=None):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.jitter = jitter
+        # Optional callable returning the datetime of the next known event, to wake up earlier than `interval`
+        self.next_due = next_due
+        self.next_run = time.monotonic() + random.uniform(0, jitter)
+
+        # Duration metrics, reported after every run
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = 0.0
+        self.max_duration = 0.0
+        self.total_duration = 0.0
+
+    def schedule_next(self):
+        delay = self.interval
+        if self.next_due is not None:
+            due = self.next_due()
+            if due is not None:
+                delay = min(delay, max((due - timezone.now()).total_seconds(), 0))
+        self.next_run = time.monotonic() + delay + random.uniform(0, self.jitter)
+
+    def record(self, duration, failed):
+        self.runs += 1
+        self.failures += int(failed)
+        self.last_duration = duration
+        self.max_duration = max(self.max_duration, duration)
+        self.total_duration += duration
+
+    def metrics(self):
+        average = self.total_duration / self.runs if self.runs else 0
+        return (
+            f"job={self.name} runs={self.runs} failures={self.failures} skipped={self.skipped} "
+            f"last={self.last_duration:.3f}s avg={average:.3f}s max={self.max_duration:.3f}s"
+        )
+
+
+class Scheduler:
+    """
+    Runs registered periodic jobs one after another inside a single long-lived process, reusing its
+    database connection. Jobs are spread with random jitter, and a per-job advisory lock keeps a job
+    from overlapping with itself when more than one scheduler is running.
+    """
+
+    def __init__(self):
+        self.jobs = []
+        self.stopped = threading.Event()
+
+    def register(self, name, func, interval, jitter=0, next_due=None):
+        self.jobs.append(Job(name, func, interval, jitter, next_due))
+
+    def stop(self, *args):
+        self.stopped.set()
+
+    def run_forever(self):
+        while not self.stopped.is_set():
+            self.run_pending()
+            wait = min(job.next_run for job in self.jobs) - time.monotonic()
+            self.stopped.wait(max(wait, 0))
+
+        for job in self.jobs:
+            logger.info("Scheduler stopped: %s", job.metrics())
+
+    def run_pending(self):
+        for job in self.jobs:
+            if self.stopped.is_set():
+                return
+            if job.next_run <= time.monotonic():
+                self.run_job(job)
+
+    def run_all(self):
+        for job in self.jobs:
+            self.run_job(job)
+
+    def run_job(self, job):
+        self.ensure_connection()
+
+        with advisory_lock(f"scheduler:{job.name}") as acquired:
+            if not acquired:
+                job.skipped += 1
+                job.schedule_next()
+                logger.warning("Skipping %s, it is already running elsewhere", job.name)
+                return
+
+            started = time.monotonic()
+            failed = False
+            try:
+                job.func()
+            except Exception:
+                failed = True
+                logger.exception("Scheduled job %s failed", job.name)
+            job.record(time.monotonic() - started, failed)
+
+        job.schedule_next()
+        logger.info(job.metrics())
+
+    def ensure_connection(self):
+        # Keep the warm connection between runs and only replace it when it has gone bad
+        if connection.connection is not None and (connection.needs_rollback or not connection.is_usable()):
+            connection.close()
@@ -1,19 +1,28 @@
 from django.core.mail import EmailMultiAlternatives
-from django.template.loader import render_to_string
-from django.http import JsonResponse
+from utils.email_templates import render_email
 from django.conf import settings
 
 
-def send_email(subject: str, user, email_context, template: str):
-    from_email = settings.DEFAULT_FROM_EMAIL
-    to_email = user.email
+def send_email(subject: str, user, email_context: dict, template: str):
+    """
+    Queues the email in the outbox; the send_queued_emails worker renders and delivers it. The context is
+    stored as JSON, so it must only hold plain values.
+    """
+    from user_accounts.models import OutgoingEmail
 
-    text_content = render_to_string(f"{template}.txt", email_context)
-    html_content = render_to_string(f"{template}.html", email_context)
+    return OutgoingEmail.objects.create(to_email=user.email, subject=subject, template=template, context=email_context)
 
-    email = EmailMultiAlternatives(subject, text_content, from_email, [to_email])
-    email.attach_alternative(html_content, "text/html")
 
-    email.send()
+def build_email(outgoing_email, connection=None):
+    text_content, html_content = render_email(outgoing_email.template, outgoing_email.context)
+
+    email = EmailMultiAlternatives(
+        outgoing_email.subject,
+        text_content,
+        settings.DEFAULT_FROM_EMAIL,
+        [outgoing_email.to_email],
+        connection=connection,
+    )
+    email.attach_alternative(html_content, "text/html")
 
-    return JsonResponse({"message": "Email sent successfully!"}, status=200)
+    return email
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from utils.image_derivatives import generate_all
+from user_accounts.models import UserProfile
+from vehicles.models import Vehicle
+
+
+class Command(BaseCommand):
+    help = "Generate the thumb/card/full derivatives of the vehicle and profile pictures uploaded before them"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--force", action="store_true", help="Regenerate derivatives that already exist")
+
+    def handle(self, *args, **options):
+        sources = [
+            (Vehicle.objects.filter(is_deleted=False), Vehicle.PICTURE_FIELDS),
+            (UserProfile.objects.exclude(profile_picture=""), ["profile_picture"]),
+        ]
+
+        written = 0
+        for queryset, field_names in sources:
+            for instance in queryset.only("id", *field_names).iterator():
+                files = [getattr(instance, field_name) for field_name in field_names]
+                files = [field_file for field_file in files if field_file]
+                if files:
+                    written += generate_all(
+                        files[0].storage, [field_file.name for field_file in files], options["force"]
+                    )
+
+        self.stdout.write(self.style.SUCCESS(f"Wrote {written} image derivatives."))
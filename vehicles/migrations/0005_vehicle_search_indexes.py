@@ -0,0 +1,29 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:07
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicles", "0004_vehicle_is_deleted"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["make", "model", "year"],
+                name="vehicle_search_make_model_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(
+                condition=models.Q(("is_deleted", False)),
+                fields=["price_per_day", "id"],
+                name="vehicle_search_price_idx",
+            ),
+        ),
+    ]
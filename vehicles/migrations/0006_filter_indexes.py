@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 09:41
+
+from django.db import migrations, models
+
+
+def create_name_trigram_index(apps, schema_editor):
+    # name__icontains compiles to UPPER("name"::text) LIKE UPPER(...), which only a trigram index on the same
+    # expression can serve; other databases keep scanning
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    schema_editor.execute(
+        'CREATE INDEX IF NOT EXISTS "vehicle_name_trgm_idx" ON "vehicles_vehicle" '
+        'USING gin (UPPER("name"::text) gin_trgm_ops) WHERE NOT "is_deleted"'
+    )
+
+
+def drop_name_trigram_index(apps, schema_editor):
+    if schema_editor.connection.vendor != "postgresql":
+        return
+    schema_editor.execute('DROP INDEX IF EXISTS "vehicle_name_trgm_idx"')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("vehicles", "0005_vehicle_search_indexes"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="vehicle",
+            index=models.Index(condition=models.Q(("is_deleted", False)), fields=["id"], name="vehicle_live_idx"),
+        ),
+        migrations.RunPython(create_name_trigram_index, drop_name_trigram_index),
+    ]
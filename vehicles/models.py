@@ -2,7 +2,23 @@ from utils.image_renamer import wrapper
 from django.db import models
 
 
+class VehicleQuerySet(models.QuerySet):
+    def available_between(self, start_date, end_date):
+        """
+        Vehicles with no active reservation overlapping [start_date, end_date), resolved in the database as
+        a NOT EXISTS anti-join against the reservations active window index.
+        """
+        from reservations.models import Reservation
+
+        overlapping = (
+            Reservation.objects.active().overlapping(start_date, end_date).filter(vehicle=models.OuterRef("pk"))
+        )
+        return self.filter(is_deleted=False).exclude(models.Exists(overlapping))
+
+
 class Vehicle(models.Model):
+    PICTURE_FIELDS = ["picture1", "picture2", "picture3", "picture4"]
+
     id = models.AutoField(primary_key=True)
     name = models.CharField(max_length=255)
     make = models.CharField(max_length=255)
@@ -21,6 +37,25 @@ class Vehicle(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_deleted = models.BooleanField(default=False)
 
+    objects = VehicleQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["make", "model", "year"],
+                condition=models.Q(is_deleted=False),
+                name="vehicle_search_make_model_idx",
+            ),
+            models.Index(
+                fields=["price_per_day", "id"],
+                condition=models.Q(is_deleted=False),
+                name="vehicle_search_price_idx",
+            ),
+            # The catalogue list, ordered by id. Its name__icontains filter uses the PostgreSQL only trigram index
+            # "vehicle_name_trgm_idx" created in migration 0006
+            models.Index(fields=["id"], condition=models.Q(is_deleted=False), name="vehicle_live_idx"),
+        ]
+
     def __str__(self):
         return f"{self.year} {self.make} {self.model} {self.price}"
 
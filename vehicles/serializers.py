@@ -1,8 +1,11 @@
 from .models import Vehicle, VehicleDetails
 from rest_framework import serializers
+from utils.image_derivatives import derivative_urls
 
 
 class VehicleSerializer(serializers.ModelSerializer):
+    picture_derivatives = serializers.SerializerMethodField()
+
     class Meta:
         model = Vehicle
         fields = [
@@ -20,10 +23,14 @@ class VehicleSerializer(serializers.ModelSerializer):
             "picture2",
             "picture3",
             "picture4",
+            "picture_derivatives",
             "created_at",
             "updated_at",
         ]
 
+    def get_picture_derivatives(self, vehicle):
+        return {field_name: derivative_urls(getattr(vehicle, field_name)) for field_name in Vehicle.PICTURE_FIELDS}
+
 
 class VehicleDetailsSerializer(serializers.ModelSerializer):
     vehicle = VehicleSerializer()
@@ -41,3 +48,14 @@ class VehicleDetailsSerializer(serializers.ModelSerializer):
             "created_at",
             "updated_at",
         ]
+
+
+class VehicleSearchSerializer(VehicleSerializer):
+    mileage = serializers.IntegerField(source="vehicledetails.mileage", read_only=True)
+    color = serializers.CharField(source="vehicledetails.color", read_only=True)
+    is_new = serializers.BooleanField(source="vehicledetails.is_new", read_only=True)
+    is_automatic = serializers.BooleanField(source="vehicledetails.is_automatic", read_only=True)
+    has_air_conditioning = serializers.BooleanField(source="vehicledetails.has_air_conditioning", read_only=True)
+
+    class Meta(VehicleSerializer.Meta):
+        fields = VehicleSerializer.Meta.fields + ["mileage", "color", "is_new", "is_automatic", "has_air_conditioning"]
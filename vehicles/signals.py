@@ -0,0 +1,46 @@
+from utils.image_derivatives import remember_images, schedule_changed_derivatives
+from django.db.models.signals import post_delete, post_init, post_save
+from django.dispatch import receiver
+from utils.response_cache import bump_version
+from django.db import transaction
+from .models import Vehicle, VehicleDetails
+
+# The cached catalogue depends on every vehicle; details responses also depend on their own vehicle
+CATALOGUE_NAMESPACE = "vehicles"
+
+
+def vehicle_namespace(vehicle_id):
+    return f"vehicle:{vehicle_id}"
+
+
+def invalidate_vehicle_cache(vehicle_ids=None):
+    """
+    Drops the cached catalogue and the details of the given vehicles (all of them when None) once the
+    current transaction commits. Call it after queryset updates, which bypass the model signals.
+    """
+    if vehicle_ids is None:
+        namespaces = [CATALOGUE_NAMESPACE]
+    else:
+        namespaces = [CATALOGUE_NAMESPACE] + [vehicle_namespace(vehicle_id) for vehicle_id in vehicle_ids]
+    transaction.on_commit(lambda: [bump_version(namespace) for namespace in namespaces])
+
+
+@receiver([post_save, post_delete], sender=Vehicle)
+def vehicle_changed(sender, instance, **kwargs):
+    invalidate_vehicle_cache([instance.id])
+
+
+@receiver(post_init, sender=Vehicle)
+def vehicle_loaded(sender, instance, **kwargs):
+    remember_images(instance, Vehicle.PICTURE_FIELDS)
+
+
+@receiver(post_save, sender=Vehicle)
+def vehicle_saved(sender, instance, created, raw=False, update_fields=None, **kwargs):
+    if not raw:
+        schedule_changed_derivatives(instance, Vehicle.PICTURE_FIELDS, created, update_fields)
+
+
+@receiver([post_save, post_delete], sender=VehicleDetails)
+def vehicle_details_changed(sender, instance, **kwargs):
+    invalidate_vehicle_cache([instance.vehicle_id])
@@ -0,0 +1,348 @@
+from utils.image_derivatives import SIZES, FORMATS, derivative_name, executor
+from utils.direct_uploads import SIGNING_SALT
+from .serializers import VehicleDetailsSerializer, VehicleSerializer
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.core.files.storage import default_storage
+from .models import Vehicle, VehicleDetails
+from user_accounts.models import UserAccount
+from reservations.models import Reservation
+from utils.date_parser import parse_date
+from rest_framework.test import APIClient
+from django.core.cache import cache
+from django.core import signing
+from moto import mock_aws
+from unittest import mock
+from decimal import Decimal
+from PIL import Image
+import itertools
+import requests
+import tempfile
+import shutil
+import io
+
+sequence = itertools.count(1)
+
+TEST_STORAGES = {
+    "default": {"BACKEND": "django.core.files.storage.InMemoryStorage"},
+    "staticfiles": {"BACKEND": "django.contrib.staticfiles.storage.StaticFilesStorage"},
+}
+
+
+def create_user(role="CLIENT"):
+    number = next(sequence)
+    # No password: hashing one is most of the cost of a test user
+    return UserAccount.objects.create(
+        email=f"user{number}@example.com", first_name="Test", last_name=f"User {number}", role=role
+    )
+
+
+def create_vehicle(price_per_day=Decimal("50.00"), **kwargs):
+    number = next(sequence)
+    vehicle = Vehicle.objects.create(
+        name=f"Toyota Corolla {number}",
+        make="Toyota",
+        model="Corolla",
+        year=2022,
+        price=Decimal("15000.00"),
+        price_per_day=price_per_day,
+        price_per_week=price_per_day * 6,
+        price_per_month=price_per_day * 25,
+        **kwargs,
+    )
+    VehicleDetails.objects.create(vehicle=vehicle, color="White", description="Test vehicle")
+    return vehicle
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class ResponseCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+        self.vehicle = create_vehicle()
+        self.details_url = f"/api/vehicles/details/{self.vehicle.id}/"
+
+    def test_unchanged_catalogue_is_not_modified(self):
+        response = self.client.get("/api/vehicles/list/")
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client.get("/api/vehicles/list/", HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_cached_responses_keep_the_serializer_field_order(self):
+        self.client.get(self.details_url)
+        data = self.client.get(self.details_url).json()
+
+        self.assertEqual(list(data), VehicleDetailsSerializer.Meta.fields)
+        self.assertEqual(list(data["vehicle"]), VehicleSerializer.Meta.fields)
+
+    def test_changes_invalidate_the_cached_details(self):
+        etag = self.client.get(self.details_url)["ETag"]
+
+        details = self.vehicle.vehicledetails
+        details.color = "Red"
+        with self.captureOnCommitCallbacks(execute=True):
+            details.save()
+
+        response = self.client.get(self.details_url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(response.json()["color"], "Red")
+
+
+@override_settings(STORAGES=TEST_STORAGES)
+class AvailabilityTests(TestCase):
+    """Bookings are half-open ranges: one ending on a day leaves the vehicle free from that day on."""
+
+    def setUp(self):
+        self.user = create_user()
+        self.vehicle = create_vehicle()
+        self.free_vehicle = create_vehicle()
+        self.booking = self.book("01/10/2030", "01/13/2030")
+
+    def book(self, start_date, end_date, **kwargs):
+        return Reservation.objects.create(
+            user=self.user,
+            vehicle=self.vehicle,
+            start_date=parse_date(start_date),
+            end_date=parse_date(end_date),
+            **kwargs,
+        )
+
+    def is_free(self, start_date, end_date):
+        return Reservation.objects.is_vehicle_free(self.vehicle, parse_date(start_date), parse_date(end_date))
+
+    def available(self, start_date, end_date):
+        return set(Vehicle.objects.available_between(parse_date(start_date), parse_date(end_date)))
+
+    def listed(self, start_date, end_date):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/vehicles/list/", {"start_date": start_date, "end_date": end_date})
+        self.assertEqual(response.status_code, 200)
+        return {vehicle["id"] for vehicle in response.data["results"]}
+
+    def test_overlapping_ranges_are_taken(self):
+        for start_date, end_date in [
+            ("01/09/2030", "01/11/2030"),
+            ("01/11/2030", "01/12/2030"),
+            ("01/12/2030", "01/15/2030"),
+            ("01/01/2030", "02/01/2030"),
+        ]:
+            self.assertFalse(self.is_free(start_date, end_date))
+            self.assertEqual(self.available(start_date, end_date), {self.free_vehicle})
+            self.assertEqual(self.listed(start_date, end_date), {self.free_vehicle.id})
+
+    def test_back_to_back_ranges_are_free(self):
+        for start_date, end_date in [("01/07/2030", "01/10/2030"), ("01/13/2030", "01/16/2030")]:
+            self.assertTrue(self.is_free(start_date, end_date))
+            self.assertEqual(self.available(start_date, end_date), {self.vehicle, self.free_vehicle})
+            self.assertEqual(self.listed(start_date, end_date), {self.vehicle.id, self.free_vehicle.id})
+
+    def test_canceled_and_inactive_reservations_free_the_vehicle(self):
+        self.booking.is_canceled = True
+        self.booking.save()
+        self.book("01/10/2030", "01/13/2030", is_active=False)
+
+        self.assertTrue(self.is_free("01/11/2030", "01/12/2030"))
+        self.assertEqual(self.available("01/11/2030", "01/12/2030"), {self.vehicle, self.free_vehicle})
+        self.assertEqual(self.listed("01/11/2030", "01/12/2030"), {self.vehicle.id, self.free_vehicle.id})
+
+    def test_deleted_vehicles_are_never_available(self):
+        self.free_vehicle.is_deleted = True
+        self.free_vehicle.save()
+
+        self.assertEqual(self.available("02/01/2030", "02/02/2030"), {self.vehicle})
+
+    def test_invalid_dates_are_rejected(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.get("/api/vehicles/list/", {"start_date": "2030-01-10", "end_date": "01/13/2030"})
+        self.assertEqual(response.status_code, 400)
+
+
+class SearchPriceTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(create_user())
+        self.vehicles = [create_vehicle(Decimal(price)) for price in ["30.00", "50.00", "80.00"]]
+
+    def search(self, **params):
+        return self.client.get("/api/vehicles/search/", params)
+
+    def found(self, **params):
+        response = self.search(**params)
+        self.assertEqual(response.status_code, 200)
+        return [vehicle["id"] for vehicle in response.data["results"]]
+
+    def test_prices_bound_the_daily_price_inclusively(self):
+        cheap, middle, expensive = (vehicle.id for vehicle in self.vehicles)
+
+        self.assertEqual(self.found(min_price="50"), [middle, expensive])
+        self.assertEqual(self.found(max_price="50.00"), [cheap, middle])
+        self.assertEqual(self.found(min_price="31", max_price="79.99"), [middle])
+        self.assertEqual(self.found(min_price="81"), [])
+
+    def test_invalid_prices_are_rejected(self):
+        for value in ["NaN", "sNaN", "Infinity", "-Infinity", "inf", "cheap", "1,5"]:
+            for param in ["min_price", "max_price"]:
+                with self.subTest(param=param, value=value):
+                    response = self.search(**{param: value})
+                    self.assertEqual(response.status_code, 400)
+                    self.assertIn("error", response.data)
+
+
+def image_bytes(image_format="JPEG", size=(800, 600)):
+    buffer = io.BytesIO()
+    Image.new("RGB", size, "navy").save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def image_file(name="car.jpg"):
+    return SimpleUploadedFile(name, image_bytes(), content_type="image/jpeg")
+
+
+class ImageDerivativeTests(TestCase):
+    """Generates the derivatives into a local filesystem storage."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        location = tempfile.mkdtemp()
+        cls.addClassCleanup(shutil.rmtree, location)
+
+        storage_settings = override_settings(
+            STORAGES={**TEST_STORAGES, "default": {"BACKEND": "django.core.files.storage.FileSystemStorage"}},
+            MEDIA_ROOT=location,
+        )
+        storage_settings.enable()
+        cls.addClassCleanup(storage_settings.disable)
+
+    def resize_after(self, save):
+        """Runs save and its on_commit callbacks, waits for the resizing they queued and returns the names sent."""
+        futures = []
+        submit = executor.submit
+
+        def submit_and_track(*args):
+            futures.append(submit(*args))
+            return futures[-1]
+
+        with mock.patch.object(executor, "submit", side_effect=submit_and_track) as tracked:
+            with self.captureOnCommitCallbacks(execute=True):
+                result = save()
+        for future in futures:
+            future.result()
+        return result, [call.args[2] for call in tracked.call_args_list]
+
+    def test_new_pictures_get_resized_copies(self):
+        vehicle, resized = self.resize_after(lambda: create_vehicle(picture1=image_file()))
+
+        name = vehicle.picture1.name
+        self.assertEqual(resized, [[name]])
+        for size, bounds in SIZES.items():
+            for extension in FORMATS:
+                with default_storage.open(derivative_name(name, size, extension)) as derivative:
+                    width, height = Image.open(derivative).size
+                self.assertLessEqual(width, bounds[0])
+                self.assertLessEqual(height, bounds[1])
+
+    def test_saves_that_leave_the_pictures_alone_resize_nothing(self):
+        vehicle, _ = self.resize_after(lambda: create_vehicle(picture1=image_file()))
+        vehicle = Vehicle.objects.get(id=vehicle.id)
+
+        vehicle.is_available = False
+        self.assertEqual(self.resize_after(vehicle.save)[1], [])
+        self.assertEqual(self.resize_after(lambda: vehicle.save(update_fields=["is_available"]))[1], [])
+
+    def test_only_the_replaced_picture_is_resized(self):
+        vehicle, _ = self.resize_after(lambda: create_vehicle(picture1=image_file()))
+        vehicle = Vehicle.objects.get(id=vehicle.id)
+
+        vehicle.picture2 = image_file("side.jpg")
+        _, resized = self.resize_after(vehicle.save)
+        self.assertEqual(resized, [[vehicle.picture2.name]])
+
+
+S3_STORAGES = {
+    **TEST_STORAGES,
+    "default": {
+        "BACKEND": "storages.backends.s3boto3.S3Boto3Storage",
+        "OPTIONS": {
+            "bucket_name": "test-bucket",
+            "region_name": "us-east-1",
+            "endpoint_url": None,
+            "access_key": "testing",
+            "secret_key": "testing",
+            "default_acl": "public-read",
+        },
+    },
+}
+
+
+@mock_aws
+@override_settings(STORAGES=S3_STORAGES)
+class DirectUploadTests(TestCase):
+    """Uploads to an S3 bucket emulated by moto through the presigned URLs, the way the clients do."""
+
+    def setUp(self):
+        default_storage.connection.meta.client.create_bucket(Bucket="test-bucket")
+        self.manager = create_user(role="MANAGER")
+        self.client = APIClient()
+        self.client.force_authenticate(self.manager)
+        self.vehicle = create_vehicle()
+
+    def create_upload(self, content_type="image/jpeg", size=1):
+        return self.client.post(
+            "/api/vehicles/pictures/upload/", {"content_type": content_type, "size": size}, format="json"
+        )
+
+    def upload(self, content, content_type="image/jpeg"):
+        upload = self.create_upload(content_type, len(content)).data
+        response = requests.put(upload["url"], data=content, headers=upload["headers"], timeout=10)
+        self.assertEqual(response.status_code, 200)
+        return upload["token"]
+
+    def attach(self, token, field="picture2"):
+        return self.client.post(
+            f"/api/vehicles/pictures/attach/{self.vehicle.id}/", {"field": field, "token": token}, format="json"
+        )
+
+    def test_uploaded_picture_is_attached(self):
+        token = self.upload(image_bytes())
+
+        response = self.attach(token)
+
+        self.assertEqual(response.status_code, 200)
+        self.vehicle.refresh_from_db()
+        self.assertEqual(self.vehicle.picture2.name, signing.loads(token, salt=SIGNING_SALT)["name"])
+        head = default_storage.connection.meta.client.head_object(Bucket="test-bucket", Key=self.vehicle.picture2.name)
+        self.assertEqual(head["ContentType"], "image/jpeg")
+
+    def test_files_that_are_not_the_declared_image_are_deleted(self):
+        for content in [b"not an image at all", image_bytes("PNG")]:
+            token = self.upload(content)
+            name = signing.loads(token, salt=SIGNING_SALT)["name"]
+
+            self.assertEqual(self.attach(token).status_code, 400)
+            self.assertFalse(default_storage.exists(name))
+        self.vehicle.refresh_from_db()
+        self.assertFalse(self.vehicle.picture2)
+
+    def test_tokens_only_work_for_their_uploader(self):
+        token = self.upload(image_bytes())
+        self.client.force_authenticate(create_user(role="MANAGER"))
+
+        self.assertEqual(self.attach(token).status_code, 400)
+
+    def test_attaching_before_the_upload_fails(self):
+        token = self.create_upload(size=1000).data["token"]
+
+        response = self.attach(token)
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(response.data["error"], "The file has not been uploaded yet.")
+
+    @override_settings(DIRECT_UPLOAD_MAX_BYTES=1000)
+    def test_oversized_and_unsupported_uploads_are_refused_up_front(self):
+        self.assertEqual(self.create_upload(size=1001).status_code, 400)
+        self.assertEqual(self.create_upload(content_type="image/gif").status_code, 400)
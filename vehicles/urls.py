@@ -1,18 +1,24 @@
 from .views import (
     create_vehicle,
     list_vehicles,
+    search_vehicles,
     update_vehicle,
     delete_vehicle,
     get_vehicle_details,
     update_vehicle_details,
+    create_picture_upload,
+    attach_vehicle_picture,
 )
 from django.urls import path
 
 urlpatterns = [
     path("create/", create_vehicle),
     path("list/", list_vehicles),
+    path("search/", search_vehicles),
     path("update/<int:vehicle_id>/", update_vehicle),
     path("delete/<int:vehicle_id>/", delete_vehicle),
     path("details/<int:vehicle_id>/", get_vehicle_details),
     path("details/update/<int:vehicle_id>/", update_vehicle_details),
+    path("pictures/upload/", create_picture_upload),
+    path("pictures/attach/<int:vehicle_id>/", attach_vehicle_picture),
 ]
@@ -1,11 +1,32 @@
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from .serializers import VehicleSerializer, VehicleDetailsSerializer
+from .serializers import VehicleSerializer, VehicleDetailsSerializer, VehicleSearchSerializer
 from rest_framework.response import Response
 from .models import Vehicle, VehicleDetails
 from rest_framework import status
-from rest_framework.pagination import PageNumberPagination
 from django.db import transaction
+from utils.pagination import WindowCountPagination, get_paginator
+from utils.date_parser import parse_date
+from utils.response_cache import cache_response
+from utils.direct_uploads import InvalidUpload, create_upload, finalize_upload
+from .signals import CATALOGUE_NAMESPACE, vehicle_namespace
+from django.conf import settings
+from decimal import Decimal, InvalidOperation
+
+
+def parse_price(value):
+    # Decimal also parses NaN, sNaN and Infinity, which are not prices and sNaN fails in comparisons
+    price = Decimal(value)
+    if not price.is_finite():
+        raise ValueError(f"{value} is not a finite number")
+    return price
+
+
+def catalogue_namespaces(request):
+    # Availability for given dates changes with every booking, so those listings are never cached
+    if request.query_params.get("start_date") and request.query_params.get("end_date"):
+        return None
+    return [CATALOGUE_NAMESPACE]
 
 
 @transaction.atomic
@@ -33,15 +54,26 @@ def create_vehicle(request):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@cache_response(settings.VEHICLE_LIST_CACHE_SECONDS, catalogue_namespaces)
 def list_vehicles(request):
     name_contains = request.query_params.get("name_contains", None)
+    start_date = request.query_params.get("start_date", None)
+    end_date = request.query_params.get("end_date", None)
 
     vehicles = Vehicle.objects.filter(is_deleted=False)
 
     if name_contains:
         vehicles = vehicles.filter(name__icontains=name_contains)
 
-    paginator = PageNumberPagination()
+    if start_date and end_date:
+        try:
+            vehicles = vehicles.available_between(parse_date(start_date), parse_date(end_date))
+        except ValueError as e:
+            return Response({"error": f"Invalid date format: {e}"}, status=status.HTTP_400_BAD_REQUEST)
+
+    vehicles = vehicles.order_by("id")
+
+    paginator = get_paginator(request, ordering=("id",))
     paginated_vehicles = paginator.paginate_queryset(vehicles, request)
 
     serializer = VehicleSerializer(paginated_vehicles, many=True)
@@ -49,6 +81,60 @@ def list_vehicles(request):
     return paginator.get_paginated_response(serializer.data)
 
 
+@api_view(["GET"])
+@permission_classes([IsAuthenticated])
+def search_vehicles(request):
+    params = request.query_params
+
+    vehicles = Vehicle.objects.filter(is_deleted=False).select_related("vehicledetails")
+
+    try:
+        start_date = params.get("start_date", None)
+        end_date = params.get("end_date", None)
+        if start_date or end_date:
+            if not (start_date and end_date):
+                return Response(
+                    {"error": "Both start_date and end_date are required to search by availability."},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            start_date = parse_date(start_date)
+            end_date = parse_date(end_date)
+            if start_date >= end_date:
+                return Response({"error": "End date must be after the start date."}, status=status.HTTP_400_BAD_REQUEST)
+            vehicles = vehicles.available_between(start_date, end_date)
+
+        if params.get("min_price"):
+            vehicles = vehicles.filter(price_per_day__gte=parse_price(params["min_price"]))
+        if params.get("max_price"):
+            vehicles = vehicles.filter(price_per_day__lte=parse_price(params["max_price"]))
+        if params.get("year"):
+            vehicles = vehicles.filter(year=int(params["year"]))
+    except (ValueError, InvalidOperation):
+        return Response(
+            {"error": "Invalid search parameters. Dates must be MM/DD/YYYY and prices and year must be numeric."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    if params.get("make"):
+        vehicles = vehicles.filter(make=params["make"])
+    if params.get("model"):
+        vehicles = vehicles.filter(model=params["model"])
+
+    for flag in ["is_automatic", "has_air_conditioning", "is_new"]:
+        if params.get(flag):
+            vehicles = vehicles.filter(**{f"vehicledetails__{flag}": params[flag].lower() == "true"})
+
+    vehicles = vehicles.order_by("price_per_day", "id")
+
+    # The page and its total count come back from the same query
+    paginator = WindowCountPagination()
+    paginated_vehicles = paginator.paginate_queryset(vehicles, request)
+
+    serializer = VehicleSearchSerializer(paginated_vehicles, many=True)
+
+    return paginator.get_paginated_response(serializer.data)
+
+
 @api_view(["PUT", "PATCH"])
 @permission_classes([AllowAny])
 def update_vehicle(request, vehicle_id):
@@ -95,6 +181,10 @@ def delete_vehicle(request, vehicle_id):
 
 @api_view(["GET"])
 @permission_classes([IsAuthenticated])
+@cache_response(
+    settings.VEHICLE_DETAILS_CACHE_SECONDS,
+    lambda request, vehicle_id: [CATALOGUE_NAMESPACE, vehicle_namespace(vehicle_id)],
+)
 def get_vehicle_details(request, vehicle_id):
     vehicle = Vehicle.objects.filter(id=vehicle_id).first()
 
@@ -137,3 +227,53 @@ def update_vehicle_details(request, vehicle_id):
     serializer.save()
 
     return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def create_picture_upload(request):
+    user = request.user
+
+    if user.role != "ADMINISTRATOR" and user.role != "MANAGER":
+        return Response(
+            {"error": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    try:
+        upload = create_upload(user, request.data.get("content_type"), request.data.get("size"))
+    except InvalidUpload as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    return Response(upload, status=status.HTTP_201_CREATED)
+
+
+@api_view(["POST"])
+@permission_classes([IsAuthenticated])
+def attach_vehicle_picture(request, vehicle_id):
+    user = request.user
+    vehicle = Vehicle.objects.filter(id=vehicle_id).first()
+
+    if user.role != "ADMINISTRATOR" and user.role != "MANAGER":
+        return Response(
+            {"error": "You do not have permission to perform this action."}, status=status.HTTP_403_FORBIDDEN
+        )
+
+    if vehicle is None:
+        return Response({"error": "Vehicle not found."}, status=status.HTTP_404_NOT_FOUND)
+
+    field = request.data.get("field")
+    if field not in Vehicle.PICTURE_FIELDS:
+        return Response(
+            {"error": f"Invalid picture field, expected one of: {', '.join(Vehicle.PICTURE_FIELDS)}."},
+            status=status.HTTP_400_BAD_REQUEST,
+        )
+
+    try:
+        name = finalize_upload(user, request.data.get("token"))
+    except InvalidUpload as e:
+        return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    setattr(vehicle, field, name)
+    vehicle.save(update_fields=[field, "updated_at"])
+
+    return Response(VehicleSerializer(vehicle).data, status=status.HTTP_200_OK)
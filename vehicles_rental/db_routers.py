@@ -0,0 +1,24 @@
+from utils.db_replica import REPLICA_ALIAS, replica_configured, replica_reads
+from django.db import DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """
+    Sends the reads of views marked with `utils.db_replica.read_from_replica` to the replica and everything else,
+    writes included, to the primary. Both hold the same data, so relations between them are allowed.
+    """
+
+    def db_for_read(self, model, **hints):
+        if replica_reads.get() and replica_configured():
+            return REPLICA_ALIAS
+        return None
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # The replica is migrated through replication
+        return db != REPLICA_ALIAS
@@ -58,6 +58,7 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    "utils.db_replica.replica_stickiness_middleware",
 ]
 
 ROOT_URLCONF = "vehicles_rental.urls"
@@ -65,9 +66,15 @@ ROOT_URLCONF = "vehicles_rental.urls"
 TEMPLATES = [
     {
         "BACKEND": "django.template.backends.django.DjangoTemplates",
-        "DIRS": [BASE_DIR / "staticfiles/"],
-        "APP_DIRS": True,
+        "DIRS": [],
         "OPTIONS": {
+            # Compiled templates are kept in memory for the life of the process
+            "loaders": [
+                (
+                    "django.template.loaders.cached.Loader",
+                    ["django.template.loaders.app_directories.Loader"],
+                ),
+            ],
             "context_processors": [
                 "django.template.context_processors.debug",
                 "django.template.context_processors.request",
@@ -83,6 +90,35 @@ WSGI_APPLICATION = "vehicles_rental.wsgi.application"
 # Database configuration
 DEVELOPMENT_MODE = os.getenv("DEVELOPMENT_MODE", "False") == "True"
 
+# Database connections: a psycopg pool per worker process by default, which also serves the ASGI workers' threads;
+# with the pool disabled, connections are kept for DATABASE_CONN_MAX_AGE seconds and checked before being reused
+DATABASE_POOL = os.getenv("DATABASE_POOL", "True") == "True"
+DATABASE_POOL_MIN_SIZE = int(os.getenv("DATABASE_POOL_MIN_SIZE", "2"))
+DATABASE_POOL_MAX_SIZE = int(os.getenv("DATABASE_POOL_MAX_SIZE", "10"))
+DATABASE_POOL_TIMEOUT = float(os.getenv("DATABASE_POOL_TIMEOUT", "10"))
+DATABASE_CONN_MAX_AGE = int(os.getenv("DATABASE_CONN_MAX_AGE", "60"))
+DATABASE_CONN_HEALTH_CHECKS = os.getenv("DATABASE_CONN_HEALTH_CHECKS", "True") == "True"
+
+
+def database_config(url):
+    config = dj_database_url.parse(
+        url,
+        conn_max_age=0 if DATABASE_POOL else DATABASE_CONN_MAX_AGE,
+        conn_health_checks=DATABASE_CONN_HEALTH_CHECKS,
+    )
+    if DATABASE_POOL and config["ENGINE"] == "django.db.backends.postgresql":
+        from psycopg_pool import ConnectionPool
+
+        # Django does not support persistent connections together with the pool, hence CONN_MAX_AGE 0 above
+        config.setdefault("OPTIONS", {})["pool"] = {
+            "min_size": DATABASE_POOL_MIN_SIZE,
+            "max_size": DATABASE_POOL_MAX_SIZE,
+            "timeout": DATABASE_POOL_TIMEOUT,
+            **({"check": ConnectionPool.check_connection} if DATABASE_CONN_HEALTH_CHECKS else {}),
+        }
+    return config
+
+
 if DEVELOPMENT_MODE is True:
     DATABASES = {
         "default": {
@@ -90,19 +126,62 @@ if DEVELOPMENT_MODE is True:
             "NAME": os.path.join(BASE_DIR, "db.sqlite3"),
         }
     }
-elif len(sys.argv) > 0 and sys.argv[1] != "collectstatic":
+elif not (len(sys.argv) > 1 and sys.argv[1] == "collectstatic"):
     if os.getenv("DATABASE_URL", None) is None:
         raise Exception("DATABASE_URL environment variable not defined")
     DATABASES = {
-        "default": dj_database_url.parse(os.getenv("DATABASE_URL")),
+        "default": database_config(os.getenv("DATABASE_URL")),
+    }
+
+# Optional read replica for the report and list endpoints, see vehicles_rental/db_routers.py. The alias always
+# exists, as a mirror of the primary in the tests; reads are only routed to it when REPLICA_DATABASE_URL is set
+REPLICA_READS_ENABLED = bool(os.getenv("REPLICA_DATABASE_URL"))
+if not (len(sys.argv) > 1 and sys.argv[1] == "collectstatic"):
+    DATABASES["replica"] = {
+        **(database_config(os.getenv("REPLICA_DATABASE_URL")) if REPLICA_READS_ENABLED else DATABASES["default"]),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_ROUTERS = ["vehicles_rental.db_routers.ReplicaRouter"]
+
+# How long (in seconds) a user's replica reads go to the primary after they wrote, so they see their own changes
+REPLICA_STICKY_SECONDS = int(os.getenv("REPLICA_STICKY_SECONDS", "10"))
+
+
+# Cache: local memory per process by default, Redis shared by every node when REDIS_URL is set
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
     }
 
+# How long (in seconds) the vehicle catalogue and details responses are cached
+VEHICLE_LIST_CACHE_SECONDS = int(os.getenv("VEHICLE_LIST_CACHE_SECONDS", "60"))
+VEHICLE_DETAILS_CACHE_SECONDS = int(os.getenv("VEHICLE_DETAILS_CACHE_SECONDS", "300"))
 
 # Braintree credentials
 BRAINTREE_ENVIRONMENT = os.getenv("BRAINTREE_ENVIRONMENT")
 BRAINTREE_MERCHANT_ID = os.getenv("BRAINTREE_MERCHANT_ID")
 BRAINTREE_PUBLIC_KEY = os.getenv("BRAINTREE_PUBLIC_KEY")
 BRAINTREE_PRIVATE_KEY = os.getenv("BRAINTREE_PRIVATE_KEY")
+BRAINTREE_TIMEOUT_SECONDS = int(os.getenv("BRAINTREE_TIMEOUT_SECONDS", "60"))
+# Pre-generated client tokens kept ready for the checkout page (0 disables the pool)
+BRAINTREE_CLIENT_TOKEN_POOL_SIZE = int(os.getenv("BRAINTREE_CLIENT_TOKEN_POOL_SIZE", "0"))
+BRAINTREE_CLIENT_TOKEN_TTL_SECONDS = int(os.getenv("BRAINTREE_CLIENT_TOKEN_TTL_SECONDS", "600"))
+
+# How long (in seconds) a reservation holds the vehicle while its payment is processed
+RESERVATION_HOLD_SECONDS = int(os.getenv("RESERVATION_HOLD_SECONDS", "300"))
+
+# Reports are served from the rollup tables when they were refreshed within this many seconds
+ROLLUP_MAX_LAG_SECONDS = int(os.getenv("ROLLUP_MAX_LAG_SECONDS", "900"))
 
 # Email backend for production
 EMAIL_BACKEND = "django.core.mail.backends.smtp.EmailBackend"
@@ -115,14 +194,18 @@ MAILGUN_DOMAIN = os.getenv("MAILGUN_DOMAIN")
 MAILGUN_APIKEY = os.getenv("MAILGUN_API_KEY")
 
 # Email settings
-EMAIL_HOST = "smtp.mailgun.org"
-EMAIL_PORT = 587
-EMAIL_USE_TLS = True
+EMAIL_HOST = os.getenv("EMAIL_HOST", "smtp.mailgun.org")
+EMAIL_PORT = int(os.getenv("EMAIL_PORT", "587"))
+EMAIL_USE_TLS = os.getenv("EMAIL_USE_TLS", "True") == "True"
 EMAIL_HOST_USER = f"postmaster@{MAILGUN_DOMAIN}"
 EMAIL_HOST_PASSWORD = MAILGUN_APIKEY
 DEFAULT_FROM_EMAIL = f"AIVehicleRental <noreply@{MAILGUN_DOMAIN}>"
 SERVER_DOMAIN = os.getenv("SERVER_DOMAIN", "http://localhost:8000")
 
+# Outbox delivery: emails are sent by the send_queued_emails worker, not in the request
+EMAIL_OUTBOX_RATE_PER_SECOND = float(os.getenv("EMAIL_OUTBOX_RATE_PER_SECOND", "10"))
+EMAIL_OUTBOX_MAX_ATTEMPTS = int(os.getenv("EMAIL_OUTBOX_MAX_ATTEMPTS", "5"))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         "NAME": "django.contrib.auth.password_validation.UserAttributeSimilarityValidator",
@@ -162,6 +245,13 @@ AWS_S3_CUSTOM_DOMAIN = f"{AWS_STORAGE_BUCKET_NAME}.{AWS_S3_REGION_NAME}.cdn.digi
 
 MEDIA_URL = f"https://{AWS_S3_CUSTOM_DOMAIN}/"
 
+# Threads resizing uploaded pictures into their thumb/card/full derivatives
+IMAGE_DERIVATIVE_WORKERS = int(os.getenv("IMAGE_DERIVATIVE_WORKERS", "2"))
+
+# Pictures and documents uploaded by clients straight to Spaces through presigned URLs
+DIRECT_UPLOAD_MAX_BYTES = int(os.getenv("DIRECT_UPLOAD_MAX_BYTES", str(20 * 1024 * 1024)))
+DIRECT_UPLOAD_EXPIRES_SECONDS = int(os.getenv("DIRECT_UPLOAD_EXPIRES_SECONDS", "900"))
+
 # STORAGES setting (Django 4.2+)
 STORAGES = {
     "default": {
@@ -230,13 +320,23 @@ LOGGING = {
             "level": "DEBUG",
             "propagate": True,
         },
+        "utils.scheduler": {
+            "handlers": ["console", "file_info"],
+            "level": "INFO",
+            "propagate": False,
+        },
+        "utils.braintree_utils": {
+            "handlers": ["console", "file_error"],
+            "level": "ERROR",
+            "propagate": False,
+        },
     },
 }
 
 # Django REST Framework configuration
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user_accounts.authentication.CachedJWTAuthentication",
     ],
     "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.IsAuthenticated",
@@ -250,6 +350,18 @@ REST_FRAMEWORK = {
 SIMPLE_JWT = {
     "ROTATE_REFRESH_TOKENS": True,
     "BLACKLIST_AFTER_ROTATION": True,
+    "TOKEN_OBTAIN_SERIALIZER": "user_accounts.serializers.UserTokenObtainPairSerializer",
+    "TOKEN_REFRESH_SERIALIZER": "user_accounts.serializers.FilteredTokenRefreshSerializer",
 }
 
+# Bloom filter in front of the refresh token blacklist, so refreshes only query it on a possible hit
+TOKEN_BLACKLIST_FILTER_ENABLED = os.getenv("TOKEN_BLACKLIST_FILTER_ENABLED", "False") == "True"
+TOKEN_BLACKLIST_FILTER_SYNC_SECONDS = int(os.getenv("TOKEN_BLACKLIST_FILTER_SYNC_SECONDS", "5"))
+TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS = int(os.getenv("TOKEN_BLACKLIST_FILTER_REBUILD_SECONDS", "3600"))
+TOKEN_BLACKLIST_FILTER_ERROR_RATE = float(os.getenv("TOKEN_BLACKLIST_FILTER_ERROR_RATE", "0.001"))
+
+# How long (in seconds) the authentication fields of a user are cached between requests. Only with the shared Redis
+# cache: saving an account could not drop the copies other processes keep in their local memory caches
+AUTH_USER_CACHE_SECONDS = int(os.getenv("AUTH_USER_CACHE_SECONDS", "60")) if os.getenv("REDIS_URL") else 0
+
 AUTH_USER_MODEL = "user_accounts.UserAccount"